@@ -6,7 +6,15 @@ a = Analysis(
     pathex=['src\\'],
     binaries=[],
     datas=[('resources\\', 'resources')],
-    hiddenimports=[],
+    # Activities are imported by name once first launched, see activities.ACTIVITIES
+    hiddenimports=[
+        'activities.panic',
+        'activities.image',
+        'activities.prompt',
+        'activities.wallpaper',
+        'activities.gif',
+        'activities.web',
+    ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -26,7 +34,8 @@ exe = EXE(
     bootloader_ignore_signals=False,
     strip=False,
     icon='resources\\default.ico',
-    upx=True,
+    # Compressed binaries have to be unpacked on every start of the onefile build
+    upx=False,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
@@ -1,65 +1,152 @@
 from abc import ABC
+import importlib
+from pathlib import Path
 import threading
-from typing import TYPE_CHECKING, List, Set
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple, Type
 
+from assets.decode import fit
 from core.config.app import AppConfig
+from core.display import Monitors
+from core.scheduler import Handle, Scheduler
 from pack.pack import Pack
 
 if TYPE_CHECKING:
     from app import App
+    from .batch import Batch
 
-
-config = AppConfig.load()
-pack = Pack(config.pack)
+# Where each activity lives, modules and their dependencies are only imported once the
+# activity is first launched. Keep in line with hiddenimports in the spec
+ACTIVITIES: Dict[str, Tuple[str, str]] = {
+    "panic": ("activities.panic", "PanicActivity"),
+    "image": ("activities.image", "ImageActivity"),
+    "prompt": ("activities.prompt", "PromptActivity"),
+    "wallpaper": ("activities.wallpaper", "WallpaperActivity"),
+    "gif": ("activities.gif", "GifActivity"),
+    "web": ("activities.web", "WebActivity"),
+}
 
 
 class BaseActivity(ABC):
     __type__: str
-    timeout: threading.Timer
+    timeout: Handle
+    stopped: bool = False
+    shown: bool = False
+    batchable: bool = False  # Whether the activity shows a popup that can be batched
 
-    def __init__(self, app: "App", timeout: int = 0):
+    def __init__(self, app: "App", timeout: int = 0, batch: Optional["Batch"] = None):
         self.app = app
+        self.batch = batch
         if timeout > 0:
-            self.timeout = threading.Timer(timeout, self.stop)
-            self.timeout.start()
+            # Stopping destroys the window, which has to happen on the main thread
+            self.timeout = Scheduler().schedule(
+                timeout, self.app.dispatcher.post, self.stop
+            )
 
-    def stop(self):
-        if hasattr(self, "timeout") and self.timeout.is_alive():
-            self.timeout.cancel()
+    def place(self, width: int, height: int) -> Tuple[int, int]:
+        """
+        Returns a position for a popup of the given size on a random monitor, such
+        that all of it is visible and it covers as little of other popups as possible.
+        The spot is held until the activity stops.
+        """
+        if hasattr(self, "spot"):
+            self.app.placement.release(self.spot)
+        self.spot, rect = self.app.placement.place(Monitors().get(), width, height)
+        return rect.x, rect.y
+
+    def presize(self, path: Path, box: Tuple[int, int]):
+        """
+        Prepares the popup window for an asset yet to be decoded, if its dimensions are
+        known from the pack index.
+        """
+        asset = self.app.pack.asset(path)
+        if asset is not None:
+            self.app.dispatcher.post(
+                self.prepare, *fit((asset.width, asset.height), box)
+            )
 
+    def prepare(self, width: int, height: int):
+        """
+        Checks out a popup window, then sizes and places it for content of the given
+        size. Preparing it again for a different size moves it.
+        """
+        if self.stopped:
+            return
+        if not hasattr(self, "popup"):
+            self.popup = self.app.windows.checkout()
+            self.root = self.popup.window
+            self.canvas = self.popup.canvas
+        elif self.size == (width, height):
+            return
+        self.size = (width, height)
+        self.canvas.config(width=width, height=height)
+        # Choose a random position on a random monitor (so that all the image is visible)
+        x, y = self.place(width, height)
+        self.root.geometry(f"{width}x{height}+{x}+{y}")
 
-from .panic import PanicActivity
+    def show(self):
+        """
+        Maps the popup once it is ready, or leaves that to the batch it was launched in.
+        """
+        self.shown = True
+        if self.batch is not None:
+            self.batch.ready(self)
+        else:
+            self.map()
 
-if config.image.active.enabled and len(pack.image) > 0:
-    from .image import ImageActivity
-if config.prompt.active.enabled and len(pack.prompt) > 0:
-    from .prompt import PromptActivity
-if config.wallpaper.active.enabled and len(pack.wallpaper) > 0:
-    from .wallpaper import WallpaperActivity
-if config.gif.active.enabled and len(pack.gif) > 0:
-    from .gif import GifActivity
-if config.web.active.enabled and len(pack.web) > 0:
-    from .web import WebActivity
+    def map(self):
+        self.root.deiconify()
+
+    def stop(self):
+        if not self.stopped:
+            self.app.admission.release(self.__type__)
+            if self.batch is not None and not self.shown:
+                self.batch.skip()
+        self.stopped = True
+        if hasattr(self, "spot"):
+            self.app.placement.release(self.spot)
+            del self.spot
+        if hasattr(self, "timeout") and self.timeout.is_alive():
+            self.timeout.cancel()
 
 
 class Activity:
+    _classes: Dict[str, Type[BaseActivity]] = {}
+    _lock = threading.Lock()
+
     @staticmethod
-    def __all_subclasses__(_cls):
-        return set(_cls.__subclasses__()).union(
-            [s for c in _cls.__subclasses__() for s in Activity.__all_subclasses__(c)]
-        )
+    def load(activity_type: str) -> Type[BaseActivity]:
+        """
+        Returns the class of an activity, importing its module the first time.
+        """
+        with Activity._lock:
+            subclass = Activity._classes.get(activity_type)
+            if subclass is None:
+                if activity_type not in ACTIVITIES:
+                    raise ValueError(f"Activity {activity_type} not found")
+                module, name = ACTIVITIES[activity_type]
+                subclass = getattr(importlib.import_module(module), name)
+                Activity._classes[activity_type] = subclass
+            return subclass
 
     @staticmethod
     def __new__(cls, activity_type: str, app: "App", *args, **kwargs) -> BaseActivity:
-        for subclass in Activity.__all_subclasses__(BaseActivity):
-            if subclass.__type__ == activity_type:
-                return subclass(app, *args, **kwargs)
-        raise ValueError(f"Activity {activity_type} not found")
+        subclass = Activity.load(activity_type)
+        # Only popups can be mapped as part of a batch
+        if not subclass.batchable:
+            kwargs.pop("batch", None)
+        return subclass(app, *args, **kwargs)
 
     @staticmethod
     def all() -> List[str]:
+        """
+        Returns the activities that are enabled and have something in the pack to show.
+        """
+        config = AppConfig()
+        pack = Pack()
         return [
-            c.__type__
-            for c in Activity.__all_subclasses__(BaseActivity)
-            if c.__type__ != "panic"
+            activity_type
+            for activity_type in ACTIVITIES
+            if activity_type != "panic"
+            and getattr(config, activity_type).active.enabled
+            and len(getattr(pack, activity_type)) > 0
         ]
@@ -0,0 +1,48 @@
+import threading
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:
+    from activities import BaseActivity
+    from app import App
+
+
+class Batch:
+    """
+    Popups launched together, such as by mitosis. Each prepares its bitmap and builds
+    its window withdrawn, and once all of them are ready they are mapped together in a
+    single pass of the main loop.
+    """
+
+    def __init__(self, app: "App", expected: int):
+        self.app = app
+        self.expected = expected
+        self._ready: List["BaseActivity"] = []
+        self._lock = threading.Lock()
+
+    def ready(self, activity: "BaseActivity"):
+        with self._lock:
+            self._ready.append(activity)
+        self._check()
+
+    def skip(self):
+        """
+        Stops waiting for a popup that is not going to be shown.
+        """
+        with self._lock:
+            self.expected -= 1
+        self._check()
+
+    def _check(self):
+        with self._lock:
+            if len(self._ready) < self.expected:
+                return
+            ready, self._ready = self._ready, []
+            self.expected = 0
+        if ready:
+            self.app.dispatcher.post(self._map, ready)
+
+    def _map(self, ready: List["BaseActivity"]):
+        for activity in ready:
+            if not activity.stopped:
+                activity.map()
+        self.app.root.update_idletasks()
@@ -1,117 +1,110 @@
 import logging
 import random
-import threading
+import time
 import tkinter
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
-import screeninfo
 from activities import BaseActivity
+from assets.blur import CENSORS
 from core.config.app import AppConfig
+from core.display import session_locked
+from assets import Frames, FrameStore, open_frames
 from pack.pack import Pack
-from PIL import Image, ImageTk, ImageFilter
+from PIL import ImageTk
 
-config = AppConfig.load()
-max_active = threading.Semaphore(config.gif.max.random())
-del config
+# How often a hidden gif checks whether it is visible again, in milliseconds
+HIDDEN_INTERVAL = 1000
 
 if TYPE_CHECKING:
+    from activities.batch import Batch
     from app import App
 
 
 class GifActivity(BaseActivity):
     __type__ = "gif"
+    batchable = True
 
-    def __init__(self, app: "App"):
-        response = max_active.acquire(blocking=False)
+    def __init__(self, app: "App", batch: Optional["Batch"] = None):
         # Same as ImageActivity, but with a gif so that it is animated and loops
         self.pack = Pack()
         self.config = AppConfig()
         self.logger = logging.getLogger(__name__)
-        if not response:
-            self.logger.info("Max active reached, not starting activity")
-            return
         # Should we set a timeout?
         if self.config.gif.timeout.minimum + self.config.gif.timeout.maximum > 0:
             timeout = self.config.gif.timeout.random()
         else:
             timeout = 0
-        super().__init__(app, timeout=timeout)
-        # Start the window as withdrawn
-        self.root = tkinter.Toplevel(self.app.root)
-        self.root.withdraw()
-        self.root.overrideredirect(True)
-        self.root.attributes("-topmost", True)
-        self.root.attributes("-toolwindow", True)
-        self.root.attributes("-alpha", self.config.gif.alpha.random() / 100.0)
-
-        self.image = Image.open(random.choice(self.pack.gif))
-        # extract the frames from the image
-        self.frames = []
-        try:
-            while True:
-                self.frames.append(self.image.copy())
-                self.image.seek(len(self.frames))  # skip to next frame
-        except EOFError:
-            pass
-        # resize the frames
-        [
-            frame.thumbnail(
-                (
-                    int(self.root.winfo_screenwidth() * 0.3),
-                    int(self.root.winfo_screenheight() * 0.3),
-                )
-            )
-            for frame in self.frames
-        ]
+        super().__init__(app, timeout=timeout, batch=batch)
 
         # Check if we should add an image overlay (censor)
+        blur = None
         if self.config.gif.censor.should():
             # Add the Image filter
-            filter = random.choice(
-                [
-                    ImageFilter.GaussianBlur(radius=10),
-                    ImageFilter.BoxBlur(radius=10),
-                    ImageFilter.GaussianBlur(radius=2),
-                    ImageFilter.BoxBlur(radius=2),
-                ]
+            blur = random.choice(CENSORS)
+
+        # Short gifs are decoded up front and shared between windows, long ones are
+        # streamed while playing. Either way it happens on the pipeline, and the
+        # window is built once the first frame is ready
+        prefetch = self.app.prefetch["gif"]
+        path, future = prefetch.take()
+        if path is None:
+            self.stop()
+            return
+        box = self.app.box(0.3)
+        self.presize(path, box)
+        if future is not None and blur is None:
+            # Prefetched gifs are never censored, so they can only be used uncensored
+            self.app.pipeline.then(future, self._show, lambda _: self.stop())
+        else:
+            self.app.pipeline.submit(
+                open_frames,
+                self.pack.variant(path, box),
+                box,
+                blur,
+                materialize=self.config.gif.materialize,
+                lookahead=self.config.gif.lookahead,
+                profile=self.config.pipeline.profile,
+                callback=self._show,
+                error=lambda _: self.stop(),
+            ).add_done_callback(
+                # Hold on to the prefetched frames until they could be blurred from
+                lambda _: prefetch.discard(future)
             )
-            self.frames = [frame.filter(filter) for frame in self.frames]
 
-        self.image = ImageTk.PhotoImage(self.frames[0])
+    def _show(self, frames: Frames):
+        self.frames = frames
+        if self.stopped:
+            self.frames.close()
+            return
+        # The window stays withdrawn until it is ready, and is likely sized and placed
+        # already
+        self.prepare(self.frames.first.image.width, self.frames.first.image.height)
+        self.root.attributes("-alpha", self.config.gif.alpha.random() / 100.0)
 
-        self.canvas = tkinter.Canvas(
-            self.root,
-            width=self.image.width(),
-            height=self.image.height(),
-            bd=0,
-            highlightthickness=0,
-        )
-        # Pack the canvas and start the activity
-        self.canvas.create_image(0, 0, anchor=tkinter.NW, image=self.image)
-        self.canvas.pack()
-
-        # Set the geometry of the window
-        ## This should go over all monitors
-        monitors = screeninfo.get_monitors()
-        if monitors:
-            monitor = random.choice(monitors)
-            # Choose a random position on the monitor (so that all the image is visible)
-            x = random.randint(
-                monitor.x, monitor.x + monitor.width - self.image.width()
-            )
-            y = random.randint(
-                monitor.y, monitor.y + monitor.height - self.image.height()
-            )
+        # Switch between frames converted up front if they fit in the budget, else
+        # paste each frame into a single Tk image as it is shown
+        self.photos = self.frames.photos(self.config.gif.photos * 1024 * 1024)
+        if self.photos is not None:
+            self.image = self.photos[self.frames.first.index]
         else:
-            x = random.randint(0, self.root.winfo_screenwidth() - self.image.width())
-            y = random.randint(0, self.root.winfo_screenheight() - self.image.height())
-        self.root.geometry(f"+{x}+{y}")
+            self.image = ImageTk.PhotoImage(self.frames.first.image)
+        self.ticks = 0
+        self.tick_time = 0.0
+
+        # Pack the canvas and start the activity
+        self.item = self.canvas.create_image(0, 0, anchor=tkinter.NW, image=self.image)
+
+        # Track whether the window can be seen, so we do not animate for nobody
+        self.obscured = False
+        self.root.bind("<Visibility>", self._on_visibility)
+        self.root.bind("<Unmap>", self._on_visibility)
+        self.root.bind("<Map>", self._on_visibility)
 
         # Should we add a button?
         if self.config.gif.button:
             # Add the button to the canvas (bottom center)
-            self.button = tkinter.Button(
-                self.canvas,
+            self.button = self.popup.button
+            self.button.config(
                 text=random.choice(self.pack.button),
                 command=self._on_close_request,
             )
@@ -124,33 +117,80 @@ class GifActivity(BaseActivity):
         else:
             self.root.bind("<Button-1>", lambda _: self._on_close_request())
 
-        self.root.deiconify()
+        self.show()
+
+        # Start the animation, the first frame is shown until its duration is up
+        self.deadline = time.perf_counter() + self.frames.first.duration / 1000
+        self._schedule(self.frames.first.duration)
 
-        # Start the animation
-        self._animate(0)
+    def _on_visibility(self, event):
+        # Children of the window share its bindings, only the window itself matters
+        if event.widget is not self.root:
+            return
+        if event.type == tkinter.EventType.Visibility:
+            self.obscured = event.state == "VisibilityFullyObscured"
+        else:
+            self.obscured = event.type == tkinter.EventType.Unmap
 
-    def _animate(self, frame):
-        self.image.paste(self.frames[frame])
-        self.canvas.itemconfig(self.canvas.find_all()[0], image=self.image)
+    def _schedule(self, delay: float):
         self.root.after(
-            int(1000 / 30),
-            lambda: hasattr(self, "frames")
-            and self._animate((frame + 1) % len(self.frames)),
+            max(int(delay), int(1000 / max(self.config.gif.fps, 1))),
+            lambda: hasattr(self, "frames") and self._animate(),
         )
 
+    def _animate(self):
+        now = time.perf_counter()
+        if self.obscured or session_locked():
+            # Pause while hidden, and pick up from the current frame once visible
+            self.deadline = now
+            self._schedule(HIDDEN_INTERVAL)
+            return
+        if now - self.deadline > 1:
+            # We were held up for too long to catch up, carry on from here instead
+            self.deadline = now
+
+        # Skip every frame whose time has already passed if the main loop fell behind
+        frame = None
+        while now >= self.deadline:
+            upcoming = self.frames.next()
+            if upcoming is None:
+                # A streamed frame is not decoded yet, keep showing the current one
+                break
+            frame = upcoming
+            self.deadline += frame.duration / 1000
+
+        if frame is not None:
+            if self.photos is not None:
+                self.canvas.itemconfig(self.item, image=self.photos[frame.index])
+            else:
+                self.image.paste(frame.image)
+            self.ticks += 1
+            self.tick_time += time.perf_counter() - now
+        self._schedule((self.deadline - now) * 1000)
+
     def _on_close_request(self):
         # If the user tries to close the window, we should stop the activity, or should we mess with them?
         if self.config.image.mitosis.should():
-            for _ in range(self.config.image.mitosis.random()):
-                self.app.launch()
+            self.app.launch(count=self.config.image.mitosis.random())
         if self.config.image.denial.should():
             return
         else:
             self.stop()
 
     def stop(self):
-        max_active.release()
-        self.root.after(0, self.root.destroy)
+        if self.stopped:
+            return
         super().stop()
+        if hasattr(self, "popup"):
+            self.app.windows.checkin(self.popup)
+        if not hasattr(self, "frames"):
+            return
+        if self.ticks:
+            self.logger.debug(
+                f"Showed {self.ticks} frames by {'switching' if self.photos else 'pasting'}"
+                f" at {self.tick_time / self.ticks * 1000:.3f}ms per frame,"
+                f" frame store {FrameStore().stats()}"
+            )
+        self.frames.close()
         del self.frames
         del self.image
@@ -1,21 +1,17 @@
 import logging
 import random
-import threading
 import tkinter
-from typing import TYPE_CHECKING
-from PIL import Image, ImageTk, ImageFilter
-import screeninfo
+from typing import TYPE_CHECKING, Optional
+from PIL import Image, ImageTk
 from activities import BaseActivity
+from assets.blur import CENSORS
 from core.config.app import AppConfig
 from pack import Pack
 
 if TYPE_CHECKING:
+    from activities.batch import Batch
     from app import App
 
-config = AppConfig.load()
-max_active = threading.Semaphore(config.image.max.random())
-del config
-
 
 class ImageActivity(BaseActivity):
     """
@@ -23,80 +19,56 @@ class ImageActivity(BaseActivity):
     """
 
     __type__ = "image"
+    batchable = True
 
-    def __init__(self, app: "App"):
-        response = max_active.acquire(blocking=False)
+    def __init__(self, app: "App", batch: Optional["Batch"] = None):
         self.pack = Pack()
         self.config = AppConfig()
         self.logger = logging.getLogger(__name__)
-        if not response:
-            self.logger.info("Max active reached, not starting activity")
-            return
         timeout = 0
         if app.config.image.timeout.minimum + app.config.image.timeout.maximum > 0:
             timeout = app.config.image.timeout.random()
 
-        super().__init__(app, timeout=timeout)
+        super().__init__(app, timeout=timeout, batch=batch)
         # Should we set a timeout?
 
-        self.root = tkinter.Toplevel(self.app.root)
-
-        self.image = Image.open(random.choice(self.pack.image))
-        self.image.thumbnail(
-            (
-                int(self.root.winfo_screenwidth() * 0.3),
-                int(self.root.winfo_screenheight() * 0.3),
-            )
-        )
-
         # Check if we should add an image overlay (censor)
+        blur = None
         if self.config.image.censor.should():
             # Add the Image filter
-            filter = random.choice(
-                [
-                    ImageFilter.GaussianBlur(radius=10),
-                    ImageFilter.BoxBlur(radius=10),
-                    ImageFilter.GaussianBlur(radius=2),
-                    ImageFilter.BoxBlur(radius=2),
-                ]
-            )
-            self.image = self.image.filter(filter)
+            blur = random.choice(CENSORS)
 
-        self.image = ImageTk.PhotoImage(self.image)
-
-        self.canvas = tkinter.Canvas(
-            self.root,
-            width=self.image.width(),
-            height=self.image.height(),
-            bd=0,
-            highlightthickness=0,
+        # Decode, scale and blur on the pipeline, the window is built once it is done.
+        # The image was likely prefetched already, leaving only the blur to do
+        path, _ = self.app.prefetch["image"].take()
+        if path is None:
+            self.stop()
+            return
+        box = self.app.box(0.3)
+        self.presize(path, box)
+        self.app.pipeline.image(
+            self.pack.variant(path, box),
+            box,
+            blur,
+            callback=self._show,
+            error=lambda _: self.stop(),
         )
 
+    def _show(self, image: Image.Image):
+        if self.stopped:
+            return
+        # The window is likely sized and placed already
+        self.prepare(image.width, image.height)
+        self.image = ImageTk.PhotoImage(image)
+
         # Pack the canvas and start the activity
         self.canvas.create_image(0, 0, anchor=tkinter.NW, image=self.image)
 
-        # Set the geometry of the window
-        ## This should go over all monitors
-        monitors = screeninfo.get_monitors()
-        if monitors:
-            monitor = random.choice(monitors)
-            # Choose a random position on the monitor (so that all the image is visible)
-            x = random.randint(
-                monitor.x, monitor.x + monitor.width - self.image.width()
-            )
-            y = random.randint(
-                monitor.y, monitor.y + monitor.height - self.image.height()
-            )
-        else:
-            x = random.randint(0, self.root.winfo_screenwidth() - self.image.width())
-            y = random.randint(0, self.root.winfo_screenheight() - self.image.height())
-        self.root.geometry(f"{self.image.width()}x{self.image.height()}+{x}+{y}")
-
         # Should we add a button?
         if self.config.image.button:
             # Add the button to the canvas (bottom center)
-            self.button = tkinter.Button(
-                self.canvas,
+            self.button = self.popup.button
+            self.button.config(
                 text=random.choice(self.pack.button),
                 command=self._on_close_request,
             )
@@ -109,25 +81,21 @@ class ImageActivity(BaseActivity):
         else:
             self.root.bind("<Button-1>", lambda _: self._on_close_request())
 
-        self.canvas.pack()
         self.root.attributes("-alpha", self.config.image.alpha.random() / 100.0)
-        self.root.overrideredirect(True)
-        self.root.attributes("-topmost", True)
-
-        # Set so that the window doesn't appear in the taskbar
-        self.root.attributes("-toolwindow", True)
+        self.show()
 
     def _on_close_request(self):
         # If the user tries to close the window, we should stop the activity, or should we mess with them?
         if self.config.image.mitosis.should():
-            for _ in range(self.config.image.mitosis.random()):
-                self.app.launch()
+            self.app.launch(count=self.config.image.mitosis.random())
         if self.config.image.denial.should():
             return
         self.stop()
 
     def stop(self):
-        max_active.release()
-        self.root.after(0, self.root.destroy)
+        if self.stopped:
+            return
+        if hasattr(self, "popup"):
+            self.app.windows.checkin(self.popup)
+            self.image = None
         super().stop()
-        del self.image
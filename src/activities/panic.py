@@ -1,4 +1,5 @@
 import logging
+import threading
 import tkinter
 from typing import TYPE_CHECKING
 from activities import BaseActivity
@@ -11,15 +12,24 @@ from passlib.hash import bcrypt
 if TYPE_CHECKING:
     from app import App
 
+# Held while a panic prompt is shown
+showing = threading.Lock()
+
 
 class PanicActivity(BaseActivity):
     __type__ = "panic"
 
     def __init__(self, app: "App"):
-        app.lock.acquire(blocking=True)
+        self.logger = logging.getLogger(__name__)
+        # Activities are started on the pipeline, so we do not hold a worker waiting for
+        # a panic prompt that is already shown
+        if not showing.acquire(blocking=False):
+            self.logger.info("Panic already in progress, not starting activity")
+            return
+        # Holds off ticks while the prompt is shown, a tick only holds it to launch
+        app.lock.acquire()
         timeout = 30  # 30 seconds to enter the password
         super().__init__(app, timeout=timeout)
-        self.logger = logging.getLogger(__name__)
         self.config = AppConfig()
         self.pack = Pack()
 
@@ -28,6 +38,17 @@ class PanicActivity(BaseActivity):
             self.logger.warning("Panic password is not set, stopping.")
             self.app.stop()
 
+        # Create a collage of the images
+        self.app.pipeline.image(
+            Paths.resources.joinpath("loading.png"),
+            self.app.box(0.5),
+            callback=self._show,
+            error=lambda _: self.stop(),
+        )
+
+    def _show(self, image: Image.Image):
+        if self.stopped:
+            return
         self.root = tkinter.Toplevel(self.app.root, bg="black")
         self.root.withdraw()
         self.root.attributes("-topmost", True)
@@ -37,15 +58,7 @@ class PanicActivity(BaseActivity):
         self.root.protocol("WM_DELETE_WINDOW", self._on_close_request)
         self.root.grab_set()
 
-        max_size = (
-            int(self.root.winfo_screenwidth() * 0.5),
-            int(self.root.winfo_screenheight() * 0.5),
-        )
-
-        # Create a collage of the images
-        self.image = Image.open(Paths.resources.joinpath("loading.png"))
-        self.image.thumbnail(max_size)
-        self.image = ImageTk.PhotoImage(self.image)
+        self.image = ImageTk.PhotoImage(image)
 
         self.canvas = tkinter.Canvas(
             self.root,
@@ -54,9 +67,10 @@ class PanicActivity(BaseActivity):
             bd=0,
             highlightthickness=0,
         )
-        # Set to the center of the screen
+        # Set to the center of the primary monitor
+        primary = self.app.monitors.primary
         self.root.geometry(
-            f"+{int(self.root.winfo_screenwidth() / 2 - self.image.width() / 2)}+{int(self.root.winfo_screenheight() / 2 - self.image.height() / 2)}"
+            f"+{int(primary.x + primary.width / 2 - self.image.width() / 2)}+{int(primary.y + primary.height / 2 - self.image.height() / 2)}"
         )
 
         self.canvas.create_image(0, 0, anchor="nw", image=self.image)
@@ -119,6 +133,10 @@ class PanicActivity(BaseActivity):
             self.app.launch()
 
     def stop(self):
-        self.root.destroy()
+        if self.stopped:
+            return
+        if hasattr(self, "root"):
+            self.root.destroy()
         self.app.lock.release()
+        showing.release()
         super().stop()
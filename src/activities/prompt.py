@@ -1,59 +1,53 @@
 import logging
 import random
-import threading
 from Levenshtein import distance
 import tkinter
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 from PIL import Image, ImageTk
-import screeninfo
 from activities import BaseActivity
 from core.config.app import AppConfig
 from pack.pack import Pack
 
 if TYPE_CHECKING:
+    from activities.batch import Batch
     from app import App
 
-config = AppConfig.load()
-max_active = threading.Semaphore(config.gif.max.random())
-del config
-
 
 class PromptActivity(BaseActivity):
     __type__ = "prompt"
+    batchable = True
 
-    def __init__(self, app: "App"):
-        response = max_active.acquire(blocking=False)
-        super().__init__(app)
+    def __init__(self, app: "App", batch: Optional["Batch"] = None):
+        super().__init__(app, batch=batch)
         self.app = app
         self.logger = logging.getLogger(__name__)
-        if not response:
-            self.logger.info("Max active reached, not starting activity")
-            return
         self.config = AppConfig()
         self.pack = Pack()
-        self.root = tkinter.Toplevel(self.app.root)
-        self.root.withdraw()
-        self.root.wm_overrideredirect(True)
-        self.root.attributes("-topmost", True)
-        self.root.attributes("-toolwindow", True)
-        self.root.attributes("-alpha", self.config.prompt.alpha.random() / 100.0)
 
-        max_size = (
-            int(self.root.winfo_screenwidth() * 0.5),
-            int(self.root.winfo_screenheight() * 0.5),
-        )
-        self.image = Image.open(random.choice(self.pack.image))
-        self.image.thumbnail(max_size)
-        self.image = ImageTk.PhotoImage(self.image)
-
-        self.canvas = tkinter.Canvas(
-            self.root,
-            width=self.image.width(),
-            height=self.image.height(),
-            bd=0,
-            highlightthickness=0,
+        # Decode and scale on the pipeline, the window is built once it is done.
+        # The image was likely prefetched already, in which case it is ready now
+        path, _ = self.app.prefetch["prompt"].take()
+        if path is None:
+            self.stop()
+            return
+        box = self.app.box(0.5)
+        self.presize(path, box)
+        self.app.pipeline.image(
+            self.pack.variant(path, box),
+            box,
+            callback=self._show,
+            error=lambda _: self.stop(),
         )
 
+    def _show(self, image: Image.Image):
+        if self.stopped:
+            return
+        # The window is likely sized and placed already
+        self.prepare(image.width, image.height)
+        self.root.attributes("-alpha", self.config.prompt.alpha.random() / 100.0)
+
+        self.image = ImageTk.PhotoImage(image)
+
         self.canvas.create_image(
             self.image.width(),
             self.image.height(),
@@ -108,11 +102,8 @@ class PromptActivity(BaseActivity):
         self.attempt = tkinter.StringVar()
 
         # Add an entry box for the user to write the line in
-        self.entry = tkinter.Entry(
-            self.canvas,
-            justify=tkinter.CENTER,
-            textvariable=self.attempt,
-        )
+        self.entry = self.popup.entry
+        self.entry.config(textvariable=self.attempt)
 
         if self.config.prompt.track.should():
             self.mistakes = 0
@@ -127,24 +118,7 @@ class PromptActivity(BaseActivity):
             width=self.image.width() - 50,
             anchor=tkinter.CENTER,
         )
-        monitors = screeninfo.get_monitors()
-        if monitors:
-            monitor = random.choice(monitors)
-            # Choose a random position on the monitor (so that all the image is visible)
-            x = random.randint(
-                monitor.x, monitor.x + monitor.width - self.image.width()
-            )
-            y = random.randint(
-                monitor.y, monitor.y + monitor.height - self.image.height()
-            )
-        else:
-            x = random.randint(0, self.root.winfo_screenwidth() - self.image.width())
-            y = random.randint(0, self.root.winfo_screenheight() - self.image.height())
-        self.root.geometry(f"{self.image.width()}x{self.image.height()}+{x}+{y}")
-
-        self.canvas.pack()
-        self.root.update()
-        self.root.deiconify()
+        self.show()
 
     def _on_keypress(self, var, index, mode):
         """
@@ -162,8 +136,7 @@ class PromptActivity(BaseActivity):
                 and self.config.prompt.mitosis.should()
             ):
                 self.logger.info("Launching mitosis")
-                for _ in range(self.config.prompt.mitosis.random()):
-                    self.app.launch()
+                self.app.launch(count=self.config.prompt.mitosis.random())
 
     def _on_attempt(self, event):
         mistakes = self.config.prompt.mistakes.random()
@@ -179,11 +152,13 @@ class PromptActivity(BaseActivity):
             self.root.after(100, lambda: self.entry.config(bg="white"))
             if self.config.prompt.mitosis.should():
                 self.logger.info("Launching mitosis")
-                for _ in range(self.config.prompt.mitosis.random()):
-                    self.app.launch()
+                self.app.launch(count=self.config.prompt.mitosis.random())
         else:
             self.stop()
 
     def stop(self):
-        max_active.release()
-        self.root.destroy()
+        if self.stopped:
+            return
+        super().stop()
+        if hasattr(self, "popup"):
+            self.app.windows.checkin(self.popup)
@@ -7,6 +7,7 @@ from PIL import Image
 from typing import TYPE_CHECKING
 from activities import BaseActivity
 from core.config.app import AppConfig
+from core.scheduler import Scheduler
 from pack.pack import Pack
 
 if TYPE_CHECKING:
@@ -19,35 +20,46 @@ class WallpaperActivity(BaseActivity):
     __type__ = "wallpaper"
 
     def __init__(self, app: "App"):
-        if not lock.locked():
-            app.on_exit_callbacks.append(self.stop)
-        lock.acquire(blocking=True)
         self.app = app
         self.config = AppConfig()
         self.pack = Pack()
         self.logger = logging.getLogger(__name__)
-
         super().__init__(app=app, timeout=0)
-        timeout = self.config.wallpaper.timer.random()
-        self.logger.info(f"Wallpaper timeout: {timeout}s")
-        self.timeout = threading.Timer(timeout, self.stop)
+        if not self.pack.wallpaper:
+            self.logger.warning("No wallpapers in the pack, not starting activity")
+            self.stop()
+            return
+        # Activities are started on the pipeline, so we do not hold a worker waiting for
+        # the wallpaper currently shown to be restored
+        if not lock.acquire(blocking=False):
+            self.logger.info("Wallpaper already changed, not starting activity")
+            self.stop()
+            return
+        app.on_exit_callbacks.append(self.stop)
 
         # Change the wallpaper
         self.wallpaper = random.choice(self.pack.wallpaper)
+        timeout = self.config.wallpaper.timer.random()
+        self.logger.info(f"Wallpaper timeout: {timeout}s")
+        self.timeout = Scheduler().schedule(timeout, self.stop)
         self.logger.info(f"Changing wallpaper to {self.wallpaper}")
 
-        self.timeout.start()
-
         if platform.system() == "Windows":
             import ctypes
 
             ctypes.windll.user32.SystemParametersInfoW(
-                20, 0, str(self.wallpaper.absolute()), 3
+                20, 0, str(self.pack.file(self.wallpaper).absolute()), 3
             )
 
     def stop(self):
-        if hasattr(self, "timeout") and self.timeout.is_alive():
-            self.timeout.cancel()
+        if self.stopped:
+            return
+        super().stop()
+        # Nothing to restore if the wallpaper was never changed
+        if not hasattr(self, "wallpaper"):
+            return
+        if self.stop in self.app.on_exit_callbacks:
+            self.app.on_exit_callbacks.remove(self.stop)
         self.logger.info(f"Changing wallpaper to {self.config.wallpaper.current}")
         if platform.system() == "Windows":
             import ctypes
@@ -77,3 +77,5 @@ class WebActivity(BaseActivity):
             )
         else:
             browsers.launch(browser_name, url=random.choice(self.pack.web))
+        # Nothing is left to do once the browser is launched
+        self.stop()
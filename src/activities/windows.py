@@ -0,0 +1,103 @@
+import logging
+import tkinter
+from typing import List, Optional
+
+
+class Popup:
+    """
+    A borderless, topmost popup window with a canvas, which is reconfigured for each
+    activity using it instead of being built and destroyed every time.
+    """
+
+    def __init__(self, root: tkinter.Tk):
+        self.window = tkinter.Toplevel(root)
+        self.window.withdraw()
+        self.window.overrideredirect(True)
+        self.window.attributes("-topmost", True)
+        # Set so that the window doesn't appear in the taskbar
+        self.window.attributes("-toolwindow", True)
+        self.canvas = tkinter.Canvas(self.window, bd=0, highlightthickness=0)
+        self.canvas.pack()
+        self._button: Optional[tkinter.Button] = None
+        self._entry: Optional[tkinter.Entry] = None
+
+    @property
+    def button(self) -> tkinter.Button:
+        if self._button is None:
+            self._button = tkinter.Button(self.canvas)
+        return self._button
+
+    @property
+    def entry(self) -> tkinter.Entry:
+        if self._entry is None:
+            self._entry = tkinter.Entry(self.canvas, justify=tkinter.CENTER)
+        return self._entry
+
+    def reset(self):
+        """
+        Hides the popup and clears everything the previous activity set up on it.
+        """
+        self.window.withdraw()
+        # Let the window size itself to its contents again
+        self.window.geometry("")
+        for sequence in self.window.bind():
+            self.window.unbind(sequence)
+        self.canvas.delete("all")
+        if self._button is not None:
+            self._button.config(text="", command="")
+        if self._entry is not None:
+            for sequence in self._entry.bind():
+                self._entry.unbind(sequence)
+            self._entry.config(textvariable="", bg="white")
+            self._entry.delete(0, tkinter.END)
+
+    def destroy(self):
+        self.window.destroy()
+
+
+class WindowPool:
+    """
+    Popup windows built ahead of time and kept withdrawn, so that showing a popup is
+    only a matter of configuring it, placing it and mapping it.
+
+    Only to be used from the Tk main thread.
+    """
+
+    def __init__(self, root: tkinter.Tk, size: int = 8):
+        self.root = root
+        self.size = size
+        self.logger = logging.getLogger(__name__)
+        self._idle: List[Popup] = []
+        self.created = 0
+        self.reused = 0
+
+    def warm(self):
+        """
+        Builds popups until the pool is full.
+        """
+        while len(self._idle) < self.size:
+            self._idle.append(self._create())
+
+    def _create(self) -> Popup:
+        self.created += 1
+        return Popup(self.root)
+
+    def checkout(self) -> Popup:
+        if self._idle:
+            self.reused += 1
+            return self._idle.pop()
+        return self._create()
+
+    def checkin(self, popup: Popup):
+        if len(self._idle) >= self.size:
+            popup.destroy()
+            return
+        popup.reset()
+        self._idle.append(popup)
+
+    def stats(self) -> dict:
+        return {
+            "idle": len(self._idle),
+            "created": self.created,
+            "reused": self.reused,
+        }
@@ -1,26 +1,40 @@
-import argparse
+import sys
+from core import startup
+
+# python app.py --importtime logs the slowest imports until the tray icon shows. Imports
+# are only timed once this runs, so it has to come before all the others
+if "--importtime" in sys.argv:
+    startup.profile_imports()
+
 import atexit
 import logging
+import multiprocessing
 import os
 from pathlib import Path
 import platform
 import random
 import signal
-import sys
 import tempfile
 import threading
 import tkinter
-from typing import Callable, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from PIL import Image
-from browsers import get
 
 import keyboard
 from activities import Activity
+from activities.batch import Batch
+from activities.windows import WindowPool
+from assets import DiskCache, ImageCache, Pipeline, Prefetch, open_frames
 from core import Singleton
 import core.config
 import core.paths
+from core.admission import Admission
+from core.dispatch import Dispatcher
+from core.display import Monitors
+from core.placement import Placement
+from core.scheduler import Scheduler
 from hibernate import Hibernation
-from pack import Pack
+from pack import Pack, Watcher
 import pystray
 
 
@@ -44,36 +58,131 @@ class App(metaclass=Singleton):
             self.logger.setLevel(logging.DEBUG)
 
         atexit.register(self.stop)
+        self.cache = ImageCache(self.config.cache.memory * 1024 * 1024)
+        self.disk_cache = DiskCache(
+            self.config.pack, self.config.cache.disk * 1024 * 1024
+        )
         self.pack = Pack(self.config.pack)
         self.paths = core.paths.Paths()
         self.system_tray: pystray.Icon = self.configure_system_tray()
 
-        self.reload()
+        self.apply_panic()
+        self.apply_hibernate()
 
         self.lock = threading.Lock()
 
         self.root = tkinter.Tk()
         self.root.geometry("0x0+0+0")
         self.root.withdraw()
+        # Only the main thread may touch Tk, so the monitors are enumerated without it,
+        # with the screen size as told by Tk as a fallback
+        self.monitors = Monitors(
+            (self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+        )
+        self.monitors.watch()
+        self.dispatcher = Dispatcher(self.root)
+        self.windows = WindowPool(self.root, self.config.windows.pool)
+        self.placement = Placement(samples=self.config.windows.samples)
+
+        self.pipeline = Pipeline(
+            self.dispatcher.post,
+            self.config.pipeline.workers,
+            self.config.pipeline.processes,
+            self.config.pipeline.profile,
+            initializer=DiskCache,
+            initargs=(self.config.pack, self.config.cache.disk * 1024 * 1024),
+        )
+
+        # Draw the next assets of each activity ahead of time and warm them while
+        # hibernating, so decoding is off the critical path of a launch
+        depth = self.config.prefetch.depth
+        self.prefetch: Dict[str, Prefetch] = {
+            "image": Prefetch(
+                lambda: self.pack.image,
+                lambda path: self.pipeline.image(
+                    self.pack.variant(path, self.box(0.3)), self.box(0.3)
+                ),
+                depth,
+            ),
+            "prompt": Prefetch(
+                lambda: self.pack.image,
+                lambda path: self.pipeline.image(
+                    self.pack.variant(path, self.box(0.5)), self.box(0.5)
+                ),
+                depth,
+            ),
+            "gif": Prefetch(
+                lambda: self.pack.gif,
+                lambda path: self.pipeline.submit(
+                    open_frames,
+                    self.pack.variant(path, self.box(0.3)),
+                    self.box(0.3),
+                    materialize=self.config.gif.materialize,
+                    lookahead=self.config.gif.lookahead,
+                    profile=self.config.pipeline.profile,
+                ),
+                depth,
+                discard=lambda frames: frames.close(),
+            ),
+        }
+
+        # Pick up assets added to, changed in or removed from the pack while running
+        self.watcher = None
+        if self.pack.archive is None:
+            self.watcher = Watcher(
+                [
+                    self.pack.path,
+                    self.pack.images,
+                    self.pack.gifs,
+                    self.pack.wallpapers,
+                ],
+                self.refresh,
+            )
 
         self.threads = [
             threading.Thread(
                 target=self.system_tray.run,
+                kwargs={"setup": self._on_tray},
             ),
             threading.Thread(
                 target=self.tick,
             ),
         ]
 
+        self.scheduler = Scheduler()
+        self.admission = Admission(
+            {
+                "image": self.config.image.max.random(),
+                "gif": self.config.gif.max.random(),
+                "prompt": self.config.prompt.max.random(),
+                "wallpaper": 1,
+            },
+            self.config.admission.rate,
+            self.config.admission.burst,
+            self.config.admission.maximum,
+        )
+        # What to do when a section of the config changes on reload
+        self.on_reload: Dict[str, List[Callable[[], None]]] = {
+            "debug": [self.apply_debug],
+            "panic": [self.apply_panic],
+            "hibernate": [self.apply_hibernate],
+            "image": [self.apply_limits],
+            "gif": [self.apply_limits],
+            "prompt": [self.apply_limits],
+            "admission": [self.apply_admission],
+            "cache": [self.apply_cache],
+            "prefetch": [self.apply_prefetch],
+            "windows": [self.apply_windows],
+        }
+        self._reload_lock = threading.Lock()
+        self.config_watcher = Watcher(
+            [core.paths.Paths.config.parent], self.reload_config
+        )
+
+        self.timer = None
         if self.config.timer.minimum + self.config.timer.maximum > 0:
-            _time = self.config.timer.random()
-            self.logger.info(f"Timer set to {_time} seconds")
-            self.threads.append(
-                threading.Timer(
-                    _time,
-                    self.stop,
-                )
-            )
+            self.timer = self.config.timer.random()
+            self.logger.info(f"Timer set to {self.timer} seconds")
 
         # If the wallpaper module is enabled, we should save the current wallpaper
         if self.config.wallpaper.active.enabled:
@@ -93,6 +202,8 @@ class App(metaclass=Singleton):
                     with wallpaper_path.open("rb") as f:
                         temp_file.write(f.read())
                     self.config.wallpaper.current = temp_file.name
+                    # Saved so that reloading the config does not lose it
+                    self.config.save()
 
     def tick(self):
         while True:
@@ -101,21 +212,69 @@ class App(metaclass=Singleton):
                     config = getattr(self.config, _type)
                     if config.active.should():
                         self.launch(_type)
+            active = Activity.all()
+            for _type, prefetch in self.prefetch.items():
+                if _type in active:
+                    prefetch.warm()
             self.hibernate.sleep()
 
-    def launch(self, activity: Optional[str] = None):
-        if activity is None:
-            # Determine correct activity by the probability of each activity
-            activity = random.choices(
-                Activity.all(),
-                weights=[getattr(self.config, _type).active.probability for _type in Activity.all()],
-                k=1,
-            )[0]
-        self.logger.info(f"Launching activity {activity}")
-        thread = threading.Timer(
-            random.random(), function=lambda: Activity(activity, self)
+    def box(self, scale: float) -> Tuple[int, int]:
+        """
+        Returns the box popups scaled to `scale` of the screen have to fit within.
+        """
+        primary = self.monitors.primary
+        return (int(primary.width * scale), int(primary.height * scale))
+
+    def launch(self, activity: Optional[str] = None, count: int = 1):
+        """
+        Launches `count` activities of type `activity`, or of random types if None. A
+        batch of popups is realized together, once all of them are ready.
+        """
+        admitted = []
+        for _ in range(count):
+            _type = activity
+            if _type is None:
+                # Determine correct activity by the probability of each activity
+                _type = random.choices(
+                    Activity.all(),
+                    weights=[
+                        getattr(self.config, _type).active.probability
+                        for _type in Activity.all()
+                    ],
+                    k=1,
+                )[0]
+            # Panic always goes through, everything else has to be admitted before any
+            # work is done for it
+            if _type != "panic" and not self.admission.admit(_type):
+                continue
+            admitted.append(_type)
+        if not admitted:
+            return
+        self.logger.info(f"Launching activities {admitted}")
+        batch = Batch(self, len(admitted)) if len(admitted) > 1 else None
+        # Constructors can block on first imports, launching a browser or setting the
+        # wallpaper, so the scheduler hands them to the pipeline instead of running them
+        self.scheduler.schedule(
+            random.random(), self.pipeline.submit, self._start, admitted, batch
         )
-        thread.start()
+
+    def _start(self, activities: List[str], batch: Optional[Batch]):
+        for activity in activities:
+            if activity != "panic":
+                self.admission.started(activity)
+            try:
+                instance = Activity(activity, self, batch=batch)
+            except Exception:
+                self.logger.exception(f"Failed to start activity {activity}")
+                self.admission.release(activity)
+                instance = None
+            # Anything that did not join the batch is not going to be mapped with it
+            if batch is not None and getattr(instance, "batch", None) is None:
+                batch.skip()
+
+    def _on_tray(self, icon: pystray.Icon):
+        icon.visible = True
+        startup.mark("Tray icon shown")
 
     def configure_system_tray(self):
         menu = pystray.Menu(
@@ -155,36 +314,138 @@ class App(metaclass=Singleton):
             menu=menu,
         )
 
+    def refresh(self):
+        """
+        Brings the pack up to date with its directory, and drops anything decoded from
+        the assets that changed.
+        """
+        changed = self.pack.refresh()
+        if not changed:
+            return
+        self.logger.info(f"{len(changed)} assets of the pack changed")
+        names = {str(path) for path in changed}
+        self.cache.invalidate(lambda key: key[0] in names)
+        for path in changed:
+            self.disk_cache.forget(path)
+        for prefetch in self.prefetch.values():
+            prefetch.invalidate(changed)
+
     def reload(self):
-        self.config.reload()
+        self.refresh()
+        self.reload_config()
+
+    def reload_config(self):
+        """
+        Reads the config again, and applies only the sections that changed.
+        """
+        with self._reload_lock:
+            try:
+                changed = self.config.reload()
+            except ValueError as e:
+                self.logger.error(f"Not reloading invalid config: {e}")
+                return
+            if not changed:
+                return
+            self.logger.info(f"Config changed: {', '.join(sorted(changed))}")
+            # Anything without a hook is read as it is used, except for these
+            for section in changed & {"pack", "pipeline", "timer"}:
+                self.logger.warning(f"Changes to {section} apply after a restart")
+            hooks = []
+            for section in sorted(changed):
+                for apply in self.on_reload.get(section, ()):
+                    if apply not in hooks:
+                        hooks.append(apply)
+            for apply in hooks:
+                apply()
+
+    def apply_debug(self):
+        self.logger.setLevel(logging.DEBUG if self.config.debug else logging.INFO)
+
+    def apply_panic(self):
+        if hasattr(self, "hook"):
+            keyboard.remove_hotkey(self.hook)
+            del self.hook
         if self.config.panic.keychord != "":
             self.hook = keyboard.add_hotkey(
                 self.config.panic.keychord, self.launch, args=("panic",)
             )
-        elif hasattr(self, "hook"):
-            keyboard.remove_hotkey(self.hook)
         else:
             self.logger.warning("No panic keychord set")
+
+    def apply_hibernate(self):
         self.hibernate = Hibernation(self.config.hibernate.strategy, self)
 
+    def apply_limits(self):
+        self.admission.resize(
+            {
+                "image": self.config.image.max.random(),
+                "gif": self.config.gif.max.random(),
+                "prompt": self.config.prompt.max.random(),
+            }
+        )
+
+    def apply_admission(self):
+        self.admission.resize(
+            rate=self.config.admission.rate,
+            burst=self.config.admission.burst,
+            maximum=self.config.admission.maximum,
+        )
+
+    def apply_cache(self):
+        self.cache.resize(self.config.cache.memory * 1024 * 1024)
+        self.disk_cache.capacity = self.config.cache.disk * 1024 * 1024
+
+    def apply_prefetch(self):
+        for prefetch in self.prefetch.values():
+            prefetch.depth = self.config.prefetch.depth
+
+    def apply_windows(self):
+        self.windows.size = self.config.windows.pool
+        self.placement.samples = max(self.config.windows.samples, 1)
+
     def start(self):
         self.logger.info("Starting application")
         [thread.start() for thread in self.threads]
+        if self.watcher is not None:
+            self.watcher.start()
+        self.config_watcher.start()
+        if self.timer is not None:
+            self.scheduler.schedule(self.timer, self.stop)
+        self.windows.warm()
+        self.dispatcher.start()
         self.root.mainloop()
 
     def stop(self):
         self.logger.info("Stopping application")
+        self.logger.debug(f"Scheduler: {self.scheduler.stats()}")
+        self.logger.debug(f"Admission: {self.admission.stats()}")
+        self.logger.debug(f"Dispatcher: {self.dispatcher.stats()}")
+        self.logger.debug(f"Windows: {self.windows.stats()}")
+        self.logger.debug(f"Monitors: {self.monitors.stats()}")
+        self.logger.debug(f"Placement: {self.placement.stats()}")
+        self.logger.debug(f"Image cache: {self.cache.stats()}")
+        for _type, prefetch in self.prefetch.items():
+            self.logger.debug(f"Prefetch {_type}: {prefetch.stats()}")
+            prefetch.clear()
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.config_watcher.stop()
+        self.disk_cache.flush()
+        self.pipeline.shutdown()
         [s() for s in self.on_exit_callbacks]
-        self.root.after(0, self.root.destroy)
+        self.dispatcher.destroy()
         self.system_tray.stop()
-        keyboard.remove_hotkey(self.hook)
-        
+        if hasattr(self, "hook"):
+            keyboard.remove_hotkey(self.hook)
+
         pid = os.getpid()
 
         # Add a delay to allow the threads to stop
-        threading.Timer(5, os.kill, args=[pid, signal.SIGINT]).start()
+        self.scheduler.schedule(5, os.kill, pid, signal.SIGINT)
 
 
 if __name__ == "__main__":
+    # Needed for the pipeline worker processes in the frozen executable
+    multiprocessing.freeze_support()
     app = App()
     app.start()
@@ -0,0 +1,7 @@
+from .blur import CENSORS, Blur
+from .cache import ImageCache
+from .disk import DiskCache
+from .image import image_key, load_image, scale_image
+from .gif import Frame, Frames, FrameStore, open_frames
+from .pipeline import Pipeline
+from .prefetch import Prefetch
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+from typing import List, NamedTuple, Optional
+from PIL import Image, ImageFilter
+
+# From this radius on, blurring a downsampled copy looks the same and is much faster
+FAST_RADIUS = 6
+
+_filters = {
+    "gaussian": ImageFilter.GaussianBlur,
+    "box": ImageFilter.BoxBlur,
+}
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+class Blur(NamedTuple):
+    kind: str  # One of gaussian or box
+    radius: float
+
+    @property
+    def name(self) -> str:
+        return f"{self.kind}{self.radius:g}"
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        """
+        Returns a blurred copy of `image`. Large radii are blurred on a downsampled
+        copy which is then scaled back up, as the detail lost doing so is blurred away.
+        """
+        # Palette images cannot be filtered
+        if image.mode in ("1", "P"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        if self.radius < FAST_RADIUS:
+            return image.filter(_filters[self.kind](self.radius))
+        factor = max(int(self.radius // (FAST_RADIUS / 2)), 1)
+        small = image.reduce(factor) if factor > 1 else image
+        small = small.filter(_filters[self.kind](self.radius / factor))
+        return small.resize(image.size, Image.Resampling.BICUBIC)
+
+
+# The blurs a censored popup picks from
+CENSORS: List[Blur] = [
+    Blur("gaussian", 10),
+    Blur("box", 10),
+    Blur("gaussian", 2),
+    Blur("box", 2),
+]
+
+
+def _executor() -> ThreadPoolExecutor:
+    # Created on first use, so that importing this module does not create a pool
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(os.cpu_count() or 1, thread_name_prefix="blur")
+        return _pool
+
+
+def blur_all(images: List[Image.Image], blur: Blur) -> List[Image.Image]:
+    """
+    Blurs every image in parallel, Pillow releases the GIL while filtering.
+    """
+    return list(_executor().map(blur.apply, images))
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+import logging
+import threading
+from typing import Callable, Hashable, Optional
+from PIL import Image
+from core import Singleton
+
+
+class ImageCache(metaclass=Singleton):
+    """
+    A size-bounded LRU cache of decoded and scaled images, so that popups showing
+    the same asset skip the decode and resize entirely.
+    """
+
+    def __init__(self, capacity: int = 64 * 1024 * 1024):
+        self.capacity = capacity
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+        self._entries: "OrderedDict[Hashable, Image.Image]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def sizeof(image: Image.Image) -> int:
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, key: Hashable) -> Optional[Image.Image]:
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key: Hashable, image: Image.Image):
+        size = self.sizeof(image)
+        if size > self.capacity:
+            self.logger.debug(f"Not caching {key}, {size} bytes exceeds capacity")
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= self.sizeof(self._entries.pop(key))
+            self._entries[key] = image
+            self.size += size
+            self._evict()
+
+    def _evict(self):
+        # Evict the least recently used images until we fit again
+        while self.size > self.capacity:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= self.sizeof(evicted)
+
+    def resize(self, capacity: int):
+        with self._lock:
+            self.capacity = capacity
+            self._evict()
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Drops every image whose key matches `predicate`, returning how many were.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self.size -= self.sizeof(self._entries.pop(key))
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "size": self.size,
+                "capacity": self.capacity,
+            }
@@ -0,0 +1,51 @@
+from typing import Dict, NamedTuple, Optional, Tuple
+from PIL import Image
+
+
+class Profile(NamedTuple):
+    resample: Image.Resampling
+    # How much larger than the target the image is kept before the final resample,
+    # lower is faster, None decodes and resamples at full size
+    reducing_gap: Optional[float]
+
+
+PROFILES: Dict[str, Profile] = {
+    "fast": Profile(Image.Resampling.BILINEAR, 1.0),
+    "balanced": Profile(Image.Resampling.BICUBIC, 2.0),
+    "quality": Profile(Image.Resampling.LANCZOS, None),
+}
+
+
+def fit(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Returns `size` scaled down to fit within `box`, keeping its aspect ratio.
+    """
+    if size[0] <= box[0] and size[1] <= box[1]:
+        return size
+    ratio = min(box[0] / size[0], box[1] / size[1])
+    return (max(round(size[0] * ratio), 1), max(round(size[1] * ratio), 1))
+
+
+def scale(
+    image: Image.Image, box: Tuple[int, int], profile: str = "balanced"
+) -> Image.Image:
+    """
+    Returns a copy of `image` scaled to fit within `box`, decoding at a reduced scale
+    where the format supports it.
+
+    JPEGs are decoded straight to 1/2, 1/4 or 1/8 scale with draft mode, any image is
+    then reduced by an integer factor before the final resample. Both have to happen
+    before `image` is loaded to save any decoding.
+    """
+    resample, reducing_gap = PROFILES[profile]
+    size = fit(image.size, box)
+    if size == image.size:
+        return image.copy()
+    if reducing_gap is not None:
+        floor = (int(size[0] * reducing_gap), int(size[1] * reducing_gap))
+        image.draft(None, floor)
+        factor = min(image.width // floor[0], image.height // floor[1])
+        # Palette images cannot be averaged, Pillow resamples them as nearest anyway
+        if factor > 1 and image.mode not in ("1", "P"):
+            image = image.reduce(factor)
+    return image.resize(size, resample)
@@ -0,0 +1,168 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+from PIL import Image
+from core import Singleton
+from core.paths import Paths
+
+# Modes that can be written to PNG without conversion
+_png_modes = ("1", "L", "LA", "I", "P", "RGB", "RGBA")
+
+
+class DiskCache(metaclass=Singleton):
+    """
+    A persistent store of pre-scaled images per pack, so that the first popups after a
+    restart do not have to decode the full size assets again.
+
+    Renditions are keyed by the content hash of the asset and the target box, the
+    content hashes themselves are kept in an index validated by the size and mtime of
+    the asset. The store is capped in size, evicting the least recently used renditions.
+
+    Worker processes of the pipeline open the same store, so the index is merged with
+    what is on disk when it is written rather than overwriting it.
+    """
+
+    def __init__(self, pack: str = "default", capacity: int = 256 * 1024 * 1024):
+        self.path = Paths.cache.joinpath(pack)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.capacity = capacity
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._changed: Set[str] = set()  # Index entries set or dropped since a flush
+        self._index: Dict[str, List] = {}
+        try:
+            with self.path.joinpath("index.json").open("r") as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            pass
+        self.size = sum(f.stat().st_size for f in self._renditions())
+        atexit.register(self.flush)
+
+    def _renditions(self) -> List[Path]:
+        return [f for f in self.path.glob("*.png") if f.is_file()]
+
+    def digest(self, path: Path, stat: os.stat_result) -> str:
+        """
+        Returns the content hash of the asset, hashing it only if it changed.
+        """
+        key = str(path)
+        with self._lock:
+            entry = self._index.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = hashlib.blake2b(digest_size=16)
+        with path.open("rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        with self._lock:
+            self._index[key] = [
+                stat.st_size,
+                stat.st_mtime_ns,
+                digest.hexdigest(),
+            ]
+            self._changed.add(key)
+        return digest.hexdigest()
+
+    def forget(self, path: Path):
+        """
+        Drops the content hash of an asset that changed or is gone. Its renditions are
+        left to be evicted, as other assets may have the same content.
+        """
+        with self._lock:
+            if self._index.pop(str(path), None) is not None:
+                self._changed.add(str(path))
+
+    def file(
+        self,
+        path: Path,
+        stat: os.stat_result,
+        box: Tuple[int, int],
+        profile: str,
+        variant: Optional[str] = None,
+    ) -> Path:
+        name = f"{self.digest(path, stat)}-{box[0]}x{box[1]}-{profile}"
+        if variant:
+            name += f"-{variant}"
+        return self.path.joinpath(f"{name}.png")
+
+    def get(self, file: Path) -> Optional[Image.Image]:
+        if not file.exists():
+            return None
+        try:
+            image = Image.open(file)
+            image.load()
+        except (OSError, ValueError):
+            self.logger.warning(f"Discarding unreadable cached image {file}")
+            file.unlink(missing_ok=True)
+            return None
+        # Touch the rendition so that it is kept as recently used
+        os.utime(file)
+        return image
+
+    def put(self, file: Path, image: Image.Image):
+        if image.mode not in _png_modes:
+            image = image.convert("RGB")
+        temp = file.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            # Stored with light compression, as decoding speed matters more than size
+            image.save(temp, format="PNG", compress_level=1)
+            os.replace(temp, file)
+        except OSError as e:
+            self.logger.warning(f"Failed to cache image {file}: {e}")
+            temp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self.size += file.stat().st_size
+            if self.size > self.capacity:
+                self._evict()
+
+    def _evict(self):
+        # Drop the least recently used renditions until we are comfortably below the cap
+        renditions = sorted(
+            ((f, f.stat()) for f in self._renditions()),
+            key=lambda r: r[1].st_mtime,
+        )
+        self.size = sum(stat.st_size for _, stat in renditions)
+        for f, stat in renditions:
+            if self.size <= self.capacity * 0.9:
+                break
+            f.unlink(missing_ok=True)
+            self.size -= stat.st_size
+        self.logger.debug(f"Evicted disk cache down to {self.size} bytes")
+
+    def flush(self):
+        """
+        Writes the entries changed in this process over the index on disk, replacing it
+        atomically so that other processes never read it half written.
+        """
+        with self._lock:
+            if not self._changed:
+                return
+            file = self.path.joinpath("index.json")
+            try:
+                with file.open("r") as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+            for key in self._changed:
+                if key in self._index:
+                    index[key] = self._index[key]
+                else:
+                    index.pop(key, None)
+            fd, temp = tempfile.mkstemp(dir=self.path, prefix="index.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(index, f)
+                os.replace(temp, file)
+            except OSError as e:
+                self.logger.warning(f"Failed to write disk cache index: {e}")
+                Path(temp).unlink(missing_ok=True)
+                return
+            self._index = index
+            self._changed.clear()
@@ -0,0 +1,406 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+import logging
+from collections import deque
+from pathlib import Path
+import threading
+from typing import Deque, Dict, Hashable, Iterator, List, NamedTuple, Optional, Tuple
+from PIL import Image, ImageSequence, ImageTk
+from core import Singleton
+from pack.archive import open_image
+from .blur import Blur, blur_all
+from .decode import scale
+
+# Browsers treat frames without a duration as 100ms, so do we
+DEFAULT_DURATION = 100
+
+
+class Frame(NamedTuple):
+    index: int
+    image: Image.Image
+    duration: int  # Milliseconds
+
+
+def decode_frames(
+    path: Path,
+    box: Tuple[int, int],
+    blur: Optional[Blur] = None,
+    profile: str = "balanced",
+) -> Iterator[Frame]:
+    """
+    Lazily decodes the frames of a gif, scaled to fit within `box` and blurred by `blur`.
+    """
+    with open_image(path) as gif:
+        for index, frame in enumerate(ImageSequence.Iterator(gif)):
+            image = scale(frame, box, profile)
+            if blur is not None:
+                image = blur.apply(image)
+            yield Frame(index, image, frame.info.get("duration") or DEFAULT_DURATION)
+
+
+class PhotoFrames:
+    """
+    Frames converted to Tk images once, so that playing them back is only a matter of
+    pointing the canvas at the next one. Each frame is converted when first shown.
+    """
+
+    def __init__(self, frames: List[Frame]):
+        self.frames = frames
+        self._photos: List[Optional[ImageTk.PhotoImage]] = [None] * len(frames)
+
+    @staticmethod
+    def sizeof(frames: List[Frame]) -> int:
+        # Tk keeps 4 bytes per pixel regardless of the mode of the source
+        return sum(f.image.width * f.image.height * 4 for f in frames)
+
+    def __getitem__(self, index: int) -> ImageTk.PhotoImage:
+        photo = self._photos[index]
+        if photo is None:
+            photo = self._photos[index] = ImageTk.PhotoImage(self.frames[index].image)
+        return photo
+
+
+class FrameStream:
+    """
+    Decodes a gif on a background thread for every window streaming it. Each window
+    reads through a window of recent frames at its own cursor, and decoding stays at
+    most `lookahead` frames ahead of the window furthest along. A window falling behind
+    by more than that, such as one paused while hidden, skips ahead to the oldest frame
+    still kept rather than holding the others back.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        box: Tuple[int, int],
+        blur: Optional[Blur] = None,
+        lookahead: int = 8,
+        profile: str = "balanced",
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.lookahead = max(lookahead, 1)
+        self._frames: Deque[Frame] = deque(maxlen=self.lookahead * 2)
+        self._base = 0  # Position in the stream of the oldest frame kept
+        self._cursors: Dict[int, int] = {}  # Position of the next frame of each reader
+        self._readers = 0
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._failed = False
+        self._thread = threading.Thread(
+            target=self._decode, args=(path, box, blur, profile), daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def _head(self) -> int:
+        return self._base + len(self._frames)
+
+    def _ahead(self) -> bool:
+        lead = max(self._cursors.values(), default=self._base)
+        return self._head - lead >= self.lookahead
+
+    def _decode(self, path, box, blur, profile):
+        try:
+            while not self._stopped:
+                decoded = False
+                for frame in decode_frames(path, box, blur, profile):
+                    decoded = True
+                    with self._condition:
+                        self._condition.wait_for(
+                            lambda: self._stopped or not self._ahead()
+                        )
+                        if self._stopped:
+                            return
+                        if len(self._frames) == self._frames.maxlen:
+                            self._base += 1
+                        self._frames.append(frame)
+                        self._condition.notify_all()
+                if not decoded:
+                    raise ValueError("no frames")
+        except Exception as e:
+            self.logger.error(f"Failed to decode {path}: {e}")
+            with self._condition:
+                self._failed = self._stopped = True
+                self._condition.notify_all()
+
+    def join(self) -> Tuple[int, Frame]:
+        """
+        Adds a reader at the position of the reader furthest along, and returns its
+        token along with the first frame it is to show, once that is decoded.
+        """
+        with self._condition:
+            reader = self._readers = self._readers + 1
+            position = max(self._cursors.values(), default=self._base)
+            self._cursors[reader] = position
+            self._condition.wait_for(lambda: self._failed or self._head > position)
+            if self._failed:
+                del self._cursors[reader]
+                raise ValueError(f"Failed to decode {self.path}")
+            return reader, self.next(reader)
+
+    def next(self, reader: int) -> Optional[Frame]:
+        """
+        Returns the next frame of `reader`, or None if it is not decoded yet.
+        """
+        with self._condition:
+            position = max(self._cursors[reader], self._base)
+            if position >= self._head:
+                return None
+            self._cursors[reader] = position + 1
+            self._condition.notify_all()
+            return self._frames[position - self._base]
+
+    def leave(self, reader: int):
+        with self._condition:
+            self._cursors.pop(reader, None)
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+
+class FrameStore(metaclass=Singleton):
+    """
+    Decoded frames shared between every window playing the same gif, reference counted
+    so that they are dropped as soon as the last window playing them stops. Gifs too
+    long to decode up front share a `FrameStream` instead.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._entries: Dict[Hashable, "Future[List[Frame]]"] = {}
+        self._references: Dict[Hashable, int] = {}
+        self._streams: Dict[Hashable, FrameStream] = {}
+        self._stream_references: Dict[Hashable, int] = {}
+        self._photos: Dict[Hashable, PhotoFrames] = {}
+        self.photo_size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(
+        path: Path,
+        box: Tuple[int, int],
+        blur: Optional[Blur] = None,
+        profile: str = "balanced",
+    ) -> Hashable:
+        return (str(path), path.stat().st_mtime_ns, box, blur, profile)
+
+    def acquire(
+        self,
+        path: Path,
+        box: Tuple[int, int],
+        blur: Optional[Blur] = None,
+        profile: str = "balanced",
+    ) -> Tuple[Hashable, List[Frame]]:
+        key = self.key(path, box, blur, profile)
+        with self._lock:
+            self._references[key] = self._references.get(key, 0) + 1
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                future = self._entries[key] = Future()
+        if owner:
+            # Decode outside of the lock, anyone else acquiring the gif waits on us
+            try:
+                future.set_result(self._decode(path, box, blur, profile))
+            except Exception as e:
+                future.set_exception(e)
+        try:
+            return key, future.result()
+        except Exception:
+            self.release(key)
+            raise
+
+    def _decode(
+        self, path: Path, box: Tuple[int, int], blur: Optional[Blur], profile: str
+    ) -> List[Frame]:
+        if blur is None:
+            return list(decode_frames(path, box, None, profile))
+        # Blur the frames of a window already playing the gif uncensored if there is
+        # one, and blur all the frames in parallel
+        with self._lock:
+            unblurred = self._entries.get(self.key(path, box, None, profile))
+        if unblurred is not None and unblurred.done() and not unblurred.exception():
+            frames = unblurred.result()
+        else:
+            frames = list(decode_frames(path, box, None, profile))
+        images = blur_all([frame.image for frame in frames], blur)
+        return [frame._replace(image=image) for frame, image in zip(frames, images)]
+
+    def release(self, key: Hashable):
+        with self._lock:
+            self._references[key] -= 1
+            if self._references[key] <= 0:
+                del self._references[key]
+                del self._entries[key]
+                photos = self._photos.pop(key, None)
+                if photos is not None:
+                    self.photo_size -= PhotoFrames.sizeof(photos.frames)
+                self.logger.debug(f"Released frames of {key[0]}")
+
+    def stream(
+        self,
+        path: Path,
+        box: Tuple[int, int],
+        blur: Optional[Blur] = None,
+        lookahead: int = 8,
+        profile: str = "balanced",
+    ) -> Tuple[Hashable, FrameStream]:
+        """
+        Returns the stream of a gif, started by the first window to play it.
+        """
+        key = self.key(path, box, blur, profile)
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = FrameStream(path, box, blur, lookahead, profile)
+                self._streams[key] = stream
+            self._stream_references[key] = self._stream_references.get(key, 0) + 1
+        return key, stream
+
+    def release_stream(self, key: Hashable):
+        with self._lock:
+            self._stream_references[key] -= 1
+            if self._stream_references[key] > 0:
+                return
+            del self._stream_references[key]
+            stream = self._streams.pop(key)
+        stream.close()
+        self.logger.debug(f"Stopped streaming {key[0]}")
+
+    def photos(self, key: Hashable, budget: int) -> Optional[PhotoFrames]:
+        """
+        Returns the Tk images of the frames of an acquired gif, or None if converting
+        them would take more than `budget` bytes across all gifs.
+        """
+        with self._lock:
+            photos = self._photos.get(key)
+            if photos is not None:
+                return photos
+            frames = self._entries[key].result()
+            size = PhotoFrames.sizeof(frames)
+            if self.photo_size + size > budget:
+                return None
+            photos = self._photos[key] = PhotoFrames(frames)
+            self.photo_size += size
+            return photos
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "animations": len(self._entries),
+                "streams": len(self._streams),
+                "references": sum(self._references.values()),
+                "photos": len(self._photos),
+                "photo_size": self.photo_size,
+            }
+
+
+class Frames(ABC):
+    """
+    A source of frames to play back, `first` is available as soon as it is constructed.
+    """
+
+    first: Frame
+
+    @abstractmethod
+    def next(self) -> Optional[Frame]:
+        """
+        Returns the frame after the previous one, or None if it is not ready yet.
+        """
+        pass
+
+    def photos(self, budget: int) -> Optional[PhotoFrames]:
+        """
+        Returns the frames converted to Tk images if they fit within `budget` bytes, or
+        None if they have to be pasted into a single Tk image on every tick instead.
+        """
+        return None
+
+    def close(self):
+        pass
+
+
+class MaterializedFrames(Frames):
+    """
+    Plays back every frame decoded up front, the frames are shared through the
+    `FrameStore` with any other window playing the same gif.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        box: Tuple[int, int],
+        blur: Optional[Blur] = None,
+        profile: str = "balanced",
+    ):
+        self.key, self.frames = FrameStore().acquire(path, box, blur, profile)
+        self.first = self.frames[0]
+        self.index = 0
+
+    def next(self) -> Optional[Frame]:
+        self.index = (self.index + 1) % len(self.frames)
+        return self.frames[self.index]
+
+    def photos(self, budget: int) -> Optional[PhotoFrames]:
+        return FrameStore().photos(self.key, budget)
+
+    def close(self):
+        if self.key is not None:
+            FrameStore().release(self.key)
+            self.key = None
+
+
+class StreamingFrames(Frames):
+    """
+    Plays back frames decoded on a background thread into a small buffer ahead of the
+    playhead, so memory stays bounded no matter how long the gif is. The buffer is
+    shared through the `FrameStore` with any other window streaming the same gif.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        box: Tuple[int, int],
+        blur: Optional[Blur] = None,
+        lookahead: int = 8,
+        profile: str = "balanced",
+    ):
+        self.key, self.stream = FrameStore().stream(path, box, blur, lookahead, profile)
+        # Playback can start as soon as the first frame is decoded
+        try:
+            self.reader, self.first = self.stream.join()
+        except Exception:
+            FrameStore().release_stream(self.key)
+            raise
+
+    def next(self) -> Optional[Frame]:
+        return self.stream.next(self.reader)
+
+    def close(self):
+        if self.key is not None:
+            self.stream.leave(self.reader)
+            FrameStore().release_stream(self.key)
+            self.key = None
+
+
+def open_frames(
+    path: Path,
+    box: Tuple[int, int],
+    blur: Optional[Blur] = None,
+    materialize: int = 60,
+    lookahead: int = 8,
+    profile: str = "balanced",
+) -> Frames:
+    """
+    Opens a gif for playback, fully decoding it if it has at most `materialize` frames
+    and streaming it otherwise.
+    """
+    with open_image(path) as gif:
+        count = getattr(gif, "n_frames", 1)
+    if count <= materialize:
+        return MaterializedFrames(path, box, blur, profile)
+    return StreamingFrames(path, box, blur, lookahead, profile)
@@ -0,0 +1,68 @@
+from pathlib import Path
+from typing import Hashable, Optional, Tuple
+from PIL import Image
+from pack.archive import open_image
+from .blur import Blur
+from .cache import ImageCache
+from .decode import scale
+from .disk import DiskCache
+
+
+def image_key(
+    path: Path,
+    box: Tuple[int, int],
+    profile: str = "balanced",
+    blur: Optional[Blur] = None,
+) -> Hashable:
+    return (str(path), path.stat().st_mtime_ns, box, profile, blur)
+
+
+def scale_image(
+    path: Path,
+    box: Tuple[int, int],
+    profile: str = "balanced",
+    blur: Optional[Blur] = None,
+    scaled: Optional[Image.Image] = None,
+) -> Image.Image:
+    """
+    Returns the image at `path` scaled to fit within `box` using the speed and quality
+    trade off of `profile` and blurred by `blur`, from the on disk cache if possible.
+
+    Blurred variants are built from `scaled` if the unblurred image is at hand.
+    """
+    disk = DiskCache()
+    file = disk.file(path, path.stat(), box, profile, blur and blur.name)
+    image = disk.get(file)
+    if image is not None:
+        return image
+    if blur is not None:
+        if scaled is None:
+            scaled = scale_image(path, box, profile)
+        image = blur.apply(scaled)
+    else:
+        with open_image(path) as source:
+            image = scale(source, box, profile)
+    disk.put(file, image)
+    return image
+
+
+def load_image(
+    path: Path,
+    box: Tuple[int, int],
+    profile: str = "balanced",
+    blur: Optional[Blur] = None,
+) -> Image.Image:
+    """
+    Returns the image at `path` scaled to fit within `box`, from the in memory or the
+    on disk cache if possible.
+
+    The returned image is shared with the cache, so it must not be modified in place.
+    """
+    cache = ImageCache()
+    key = image_key(path, box, profile, blur)
+    image = cache.get(key)
+    if image is None:
+        scaled = None if blur is None else cache.get(image_key(path, box, profile))
+        image = scale_image(path, box, profile, blur, scaled)
+        cache.put(key, image)
+    return image
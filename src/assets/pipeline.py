@@ -0,0 +1,147 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+from PIL import Image
+from core import Singleton
+from .blur import Blur
+from .cache import ImageCache
+from .image import image_key, scale_image
+
+
+class Prepared(NamedTuple):
+    scaled: Optional[Image.Image]  # Only set if it had to be scaled for this
+    image: Image.Image
+
+
+def prepare_image(
+    path: Path,
+    box: Tuple[int, int],
+    blur: Optional[Blur] = None,
+    scaled: Optional[Image.Image] = None,
+    profile: str = "balanced",
+) -> Prepared:
+    """
+    Scales the image at `path` to fit within `box` and blurs it by `blur`, starting from
+    `scaled` if the unblurred image is at hand. Runs on the pipeline, possibly in
+    another process.
+    """
+    if blur is None:
+        image = scale_image(path, box, profile)
+        return Prepared(image, image)
+    return Prepared(None, scale_image(path, box, profile, blur, scaled))
+
+
+class Pipeline(metaclass=Singleton):
+    """
+    A pool shared by all activities that does the Pillow work of preparing assets off
+    the UI path, and hands the results over to the Tk main thread through `dispatch`.
+
+    Decoding and scaling can run on a process pool, anything relying on state in this
+    process, like the frame store, always runs on the thread pool.
+    """
+
+    def __init__(
+        self,
+        dispatch: Callable[[Callable[[], Any]], Any],
+        workers: int = 0,
+        processes: bool = False,
+        profile: str = "balanced",
+        initializer: Optional[Callable[..., Any]] = None,
+        initargs: Tuple = (),
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.dispatch = dispatch
+        self.profile = profile
+        workers = workers or os.cpu_count() or 1
+        self.threads = ThreadPoolExecutor(workers, thread_name_prefix="pipeline")
+        self.processes: Executor = (
+            ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs)
+            if processes
+            else self.threads
+        )
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        callback: Optional[Callable[[Any], Any]] = None,
+        error: Optional[Callable[[BaseException], Any]] = None,
+        **kwargs,
+    ) -> Future:
+        """
+        Runs `fn` on the thread pool, then `callback` with its result on the main thread,
+        or `error` with the exception it raised.
+        """
+        future = self.threads.submit(fn, *args, **kwargs)
+        self.then(future, callback, error)
+        return future
+
+    def image(
+        self,
+        path: Path,
+        box: Tuple[int, int],
+        blur: Optional[Blur] = None,
+        callback: Optional[Callable[[Image.Image], Any]] = None,
+        error: Optional[Callable[[BaseException], Any]] = None,
+    ) -> "Future[Image.Image]":
+        """
+        Prepares the image at `path` for display, scaled to fit within `box` and blurred
+        by `blur`, then calls `callback` with it on the main thread.
+        """
+        future: "Future[Image.Image]" = Future()
+        # The memory cache lives in this process, so only hit the pool on a miss
+        cache = ImageCache()
+        key = image_key(path, box, self.profile, blur)
+        image = cache.get(key)
+        if image is not None:
+            future.set_result(image)
+        else:
+            scaled_key = image_key(path, box, self.profile)
+            scaled = None if blur is None else cache.get(scaled_key)
+
+            def prepared(f: "Future[Prepared]"):
+                try:
+                    result = f.result()
+                except BaseException as e:
+                    future.set_exception(e)
+                    return
+                if result.scaled is not None:
+                    cache.put(scaled_key, result.scaled)
+                cache.put(key, result.image)
+                future.set_result(result.image)
+
+            self.processes.submit(
+                prepare_image, path, box, blur, scaled, self.profile
+            ).add_done_callback(prepared)
+        self.then(future, callback, error)
+        return future
+
+    def then(
+        self,
+        future: Future,
+        callback: Optional[Callable[[Any], Any]] = None,
+        error: Optional[Callable[[BaseException], Any]] = None,
+    ):
+        """
+        Calls `callback` with the result of `future` on the main thread once it is done,
+        or `error` with the exception it raised.
+        """
+
+        def done(f: Future):
+            if f.cancelled():
+                return
+            exception = f.exception()
+            if exception is not None:
+                self.logger.error(f"Failed to prepare asset: {exception}")
+                if error is not None:
+                    self.dispatch(lambda: error(exception))
+            elif callback is not None:
+                self.dispatch(lambda: callback(f.result()))
+
+        future.add_done_callback(done)
+
+    def shutdown(self):
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        self.processes.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,102 @@
+from collections import deque
+from concurrent.futures import Future
+import logging
+from pathlib import Path
+import random
+import threading
+from typing import Any, Callable, Collection, Deque, List, Optional, Tuple
+
+
+class Prefetch:
+    """
+    Draws the next few assets an activity will show ahead of time, so that they can be
+    warmed in the background while the app hibernates between ticks.
+
+    Picks are drawn exactly as the activity would and handed out in the order they were
+    drawn, so the distribution of what is shown does not change.
+    """
+
+    def __init__(
+        self,
+        choices: Callable[[], List[Path]],
+        warm: Callable[[Path], Future],
+        depth: int = 2,
+        discard: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.choices = choices
+        self._warm = warm
+        self.depth = depth
+        self._discard = discard
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+        self._picks: Deque[List] = deque()
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """
+        Tops the picks up to the prefetch depth and starts warming any that are not yet.
+        """
+        with self._lock:
+            choices = self.choices()
+            if not choices:
+                return
+            while len(self._picks) < self.depth:
+                self._picks.append([random.choice(choices), None])
+            for pick in self._picks:
+                if pick[1] is None:
+                    pick[1] = self._warm(pick[0])
+
+    def take(self) -> Tuple[Optional[Path], Optional[Future]]:
+        """
+        Returns the next asset to show, along with the future warming it if any. The
+        asset is None if there is nothing to choose from.
+        """
+        with self._lock:
+            if self._picks:
+                path, future = self._picks.popleft()
+            else:
+                choices = self.choices()
+                if not choices:
+                    self.logger.warning("No assets to choose from")
+                    return None, None
+                path, future = random.choice(choices), None
+        if future is not None and future.done() and not future.exception():
+            self.hits += 1
+        else:
+            self.misses += 1
+        return path, future
+
+    def discard(self, future: Optional[Future]):
+        """
+        Lets go of a warmed asset that is not going to be shown after all.
+        """
+        if future is None or self._discard is None:
+            return
+        discard = self._discard
+        future.add_done_callback(
+            lambda f: f.cancelled() or f.exception() or discard(f.result())
+        )
+
+    def invalidate(self, paths: Collection[Path]):
+        """
+        Drops the picks of assets that changed or are gone, they are drawn again.
+        """
+        with self._lock:
+            stale = [pick for pick in self._picks if pick[0] in paths]
+            self._picks = deque(pick for pick in self._picks if pick[0] not in paths)
+        for _, future in stale:
+            self.discard(future)
+
+    def clear(self):
+        with self._lock:
+            picks, self._picks = self._picks, deque()
+        for _, future in picks:
+            self.discard(future)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "queued": len(self._picks),
+        }
@@ -0,0 +1,49 @@
+"""
+Times loading and saving the config through the pydantic codec against the
+dataclasses_json path it replaced. Run from src with `python -m benchmarks.config`.
+"""
+
+import json
+import timeit
+from dataclasses_json import dataclass_json
+from core import Singleton
+from core.config import codec
+from core.config.app import AppConfig
+
+
+def dataclasses_json_load(content: str) -> AppConfig:
+    # The app wide config would be returned as is, so every run parses a new one
+    Singleton._instances.pop(AppConfig, None)
+    return AppConfig.from_json(content)  # type: ignore
+
+
+def dataclasses_json_save(config: AppConfig) -> str:
+    return json.dumps(config.__dict__, indent=4, default=lambda o: o.__dict__)
+
+
+def codec_save(config: AppConfig) -> str:
+    return json.dumps(codec.encode(config), indent=4)
+
+
+def main(number: int = 2000):
+    # The config is no longer decorated for dataclasses_json, so do it here
+    dataclass_json(AppConfig)
+    config = AppConfig()
+    content = codec_save(config)
+    # Compile the schema up front, it is done once per process
+    codec.adapter()
+    assert codec.decode(content) == config, "The codec does not round trip"
+
+    results = {
+        "load dataclasses_json": lambda: dataclasses_json_load(content),
+        "load codec": lambda: codec.decode(content),
+        "save dataclasses_json": lambda: dataclasses_json_save(config),
+        "save codec": lambda: codec_save(config),
+    }
+    for name, run in results.items():
+        seconds = min(timeit.repeat(run, number=number, repeat=5)) / number
+        print(f"{name:<24}{seconds * 1e6:>10.1f}us")
+
+
+if __name__ == "__main__":
+    main()
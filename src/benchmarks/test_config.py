@@ -0,0 +1,56 @@
+"""
+Checks the config codec the benchmark times. Run from src with
+`python -m pytest benchmarks`.
+"""
+
+import json
+import pytest
+from core.config import codec
+from core.config.app import AppConfig
+
+
+def test_round_trip():
+    config = AppConfig()
+    data = codec.encode(config)
+    data["image"]["timeout"] = {"minimum": 1, "maximum": 2}
+    data["admission"]["rate"] = 0.5
+    decoded = codec.decode(json.dumps(data))
+    assert decoded.image.timeout.maximum == 2
+    assert decoded.admission.rate == 0.5
+    assert codec.decode(json.dumps(codec.encode(decoded))) == decoded
+
+
+def test_errors_are_reported_together():
+    data = codec.encode(AppConfig())
+    data["timer"] = {"minimum": 10, "maximum": 5}
+    data["gif"]["active"]["probability"] = "often"
+    data["image"]["alpah"] = {"minimum": 0, "maximum": 100}
+    data["imge"] = {}
+    with pytest.raises(codec.ConfigError) as raised:
+        codec.decode(json.dumps(data))
+    assert sorted(raised.value.errors) == [
+        "gif.active.probability: Input should be a valid number, unable to parse "
+        "string as a number",
+        "image.alpah: unknown setting",
+        "imge: unknown setting",
+        "timer: Minimum cannot be greater than maximum",
+    ]
+
+
+def test_malformed_json():
+    with pytest.raises(codec.ConfigError):
+        codec.decode("{")
+
+
+def test_unknown_settings_dropped_when_not_strict():
+    data = codec.encode(AppConfig())
+    data["startup"] = True
+    data["image"]["alpah"] = {"minimum": 0, "maximum": 100}
+    data["admission"]["rate"] = 0.5
+    decoded = codec.decode(json.dumps(data), strict=False)
+    assert decoded.admission.rate == 0.5
+    assert "startup" not in codec.encode(decoded)
+    # Invalid values are still rejected
+    data["timer"] = {"minimum": 10, "maximum": 5}
+    with pytest.raises(codec.ConfigError):
+        codec.decode(json.dumps(data), strict=False)
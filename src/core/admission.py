@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """
+    Allows `burst` takes at once, refilling at `rate` takes per second.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Admission:
+    """
+    Decides whether an activity may be launched before anything is scheduled or built
+    for it, so that mitosis bursts level off instead of piling up windows.
+
+    Each activity type is limited by a token bucket and by how many of it may be active
+    at once, and all activities together by a global cap. An activity holds its slot
+    from being admitted until it stops.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, int],
+        rate: float = 2.0,
+        burst: int = 10,
+        maximum: int = 60,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.limits = limits
+        self.rate = rate
+        self.burst = burst
+        self.maximum = maximum
+        self.pending = 0  # Admitted but not started yet, the launch queue depth
+        self.active: Dict[str, int] = {}
+        self.admitted: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def admit(self, activity: str) -> bool:
+        with self._lock:
+            reason: Optional[str] = None
+            bucket = self._buckets.setdefault(
+                activity, TokenBucket(self.rate, self.burst)
+            )
+            if sum(self.active.values()) >= self.maximum:
+                reason = "too many activities"
+            elif self.active.get(activity, 0) >= self.limits.get(
+                activity, self.maximum
+            ):
+                reason = f"too many {activity} activities"
+            elif not bucket.take():
+                reason = f"{activity} launched too often"
+            if reason is not None:
+                self.rejected[activity] = self.rejected.get(activity, 0) + 1
+                self.logger.info(f"Not launching {activity}, {reason}")
+                return False
+            self.active[activity] = self.active.get(activity, 0) + 1
+            self.admitted[activity] = self.admitted.get(activity, 0) + 1
+            self.pending += 1
+            return True
+
+    def started(self, activity: str):
+        with self._lock:
+            self.pending -= 1
+
+    def release(self, activity: str):
+        with self._lock:
+            # Activities that bypass admission have nothing to release
+            if self.active.get(activity, 0) > 0:
+                self.active[activity] -= 1
+
+    def resize(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        maximum: Optional[int] = None,
+    ):
+        """
+        Changes the limits while running. Activities over a lowered limit carry on, no
+        more are admitted until enough of them stopped.
+        """
+        with self._lock:
+            if limits is not None:
+                self.limits.update(limits)
+            if maximum is not None:
+                self.maximum = maximum
+            if rate is not None:
+                self.rate = rate
+            if burst is not None:
+                self.burst = burst
+            for bucket in self._buckets.values():
+                bucket.rate = self.rate
+                bucket.burst = self.burst
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": self.pending,
+                "active": dict(self.active),
+                "admitted": dict(self.admitted),
+                "rejected": dict(self.rejected),
+            }
@@ -1,16 +1,13 @@
-from dataclasses import dataclass
-import json
+from dataclasses import dataclass, fields
 import logging
-import platform
 import random
-from typing import Optional
-from dataclasses_json import dataclass_json
-import requests
+from typing import Optional, Set
 from core import Singleton
 from core.paths import Paths
+from . import codec
+from .store import ConfigStore
 
 
-@dataclass_json
 @dataclass
 class RangeType:
     minimum: int
@@ -28,7 +25,6 @@ class RangeType:
             raise ValueError("Minimum cannot be greater than maximum")
 
 
-@dataclass_json
 @dataclass
 class ProbabilityType:
     enabled: bool
@@ -46,7 +42,6 @@ class ProbabilityType:
             raise ValueError("Probability must be between 0 and 1")
 
 
-@dataclass_json
 @dataclass
 class ProbabilityRangeType:
     enabled: bool
@@ -75,7 +70,6 @@ class ProbabilityRangeType:
             raise ValueError("Minimum cannot be greater than maximum")
 
 
-@dataclass_json
 @dataclass
 class GifActivityConfig:
     active: ProbabilityType = ProbabilityType(enabled=True, probability=0.05)
@@ -88,9 +82,12 @@ class GifActivityConfig:
     censor: ProbabilityType = ProbabilityType(enabled=True, probability=0.1)
     button: bool = True
     max: RangeType = RangeType(minimum=5, maximum=10)
+    materialize: int = 60  # Gifs with more frames than this are streamed
+    lookahead: int = 8  # Frames decoded ahead of the playhead when streaming
+    fps: int = 30  # Upper bound on the frame rate, gifs play at their own pace below it
+    photos: int = 128  # Megabytes of frames to keep converted for Tk across all gifs
 
 
-@dataclass_json
 @dataclass
 class ImageActivityConfig:
     active: ProbabilityType = ProbabilityType(enabled=True, probability=0.05)
@@ -105,7 +102,6 @@ class ImageActivityConfig:
     max: RangeType = RangeType(minimum=20, maximum=50)
 
 
-@dataclass_json
 @dataclass
 class PromptActivityConfig:
     active: ProbabilityType = ProbabilityType(enabled=True, probability=0.05)
@@ -119,7 +115,6 @@ class PromptActivityConfig:
     alpha: RangeType = RangeType(minimum=50, maximum=100)
 
 
-@dataclass_json
 @dataclass
 class WallpaperActivityConfig:
     active: ProbabilityType = ProbabilityType(enabled=True, probability=0.05)
@@ -127,14 +122,12 @@ class WallpaperActivityConfig:
     current: str = ""
 
 
-@dataclass_json
 @dataclass
 class WebActivityConfig:
     active: ProbabilityType = ProbabilityType(enabled=True, probability=0.05)
     private: ProbabilityType = ProbabilityType(enabled=True, probability=1.0)
 
 
-@dataclass_json
 @dataclass
 class PanicConfig:
     keychord: str = "shift+escape"
@@ -143,7 +136,6 @@ class PanicConfig:
     )
 
 
-@dataclass_json
 @dataclass
 class HibernateConfig:
     strategy: str = "default"
@@ -151,7 +143,41 @@ class HibernateConfig:
     activity: RangeType = RangeType(minimum=5, maximum=10)
 
 
-@dataclass_json
+@dataclass
+class CacheConfig:
+    memory: int = 64  # Megabytes of decoded images to keep in memory
+    disk: int = 256  # Megabytes of pre-scaled images to keep on disk
+
+
+@dataclass
+class PipelineConfig:
+    workers: int = 0  # Defaults to the number of cores
+    processes: bool = False  # Scale images in worker processes instead of threads
+    profile: str = "balanced"  # Scaling trade off, one of fast, balanced or quality
+
+    def __post_init__(self):
+        if self.profile not in ("fast", "balanced", "quality"):
+            raise ValueError("Profile must be one of fast, balanced or quality")
+
+
+@dataclass
+class PrefetchConfig:
+    depth: int = 2  # Assets drawn and warmed ahead of time per activity, 0 to disable
+
+
+@dataclass
+class AdmissionConfig:
+    rate: float = 2.0  # Launches per second per activity once a burst is used up
+    burst: int = 10  # Launches allowed at once per activity
+    maximum: int = 60  # Activities allowed at once across all types
+
+
+@dataclass
+class WindowsConfig:
+    pool: int = 8  # Popup windows built at startup and kept around for reuse
+    samples: int = 24  # Random spots tried before looking for a free one everywhere
+
+
 @dataclass(init=True)
 class AppConfig(metaclass=Singleton):
     debug: bool = False
@@ -174,38 +200,74 @@ class AppConfig(metaclass=Singleton):
     # Panic
     panic: PanicConfig = PanicConfig()
 
+    # Caches
+    cache: CacheConfig = CacheConfig()
+
+    # Asset preparation
+    pipeline: PipelineConfig = PipelineConfig()
+    prefetch: PrefetchConfig = PrefetchConfig()
+
+    # Launch limits
+    admission: AdmissionConfig = AdmissionConfig()
+
+    # Popup windows
+    windows: WindowsConfig = WindowsConfig()
+
     def __post_init__(self):
         if self.timer.minimum > self.timer.maximum:
             raise ValueError("Minimum cannot be greater than maximum")
-        self.save()
 
     @classmethod
     def load(cls):
-        paths = Paths()
-        if not paths.config.exists():
+        """
+        Returns the config, reading it from disk only the first time.
+        """
+        if cls in Singleton._instances:
+            return cls()
+        content = store.read()
+        if content is None:
             cfg = AppConfig()
-            cfg.save()
-            return cfg
-        with open(paths.config, "r") as f:
-            return AppConfig.from_json(f.read())  # type: ignore
-
-    def reload(self):
-        paths = Paths()
-        with open(paths.config, "r") as f:
-            self.__dict__ = AppConfig.from_json(f.read()).__dict__  # type: ignore
+        else:
+            try:
+                cfg = codec.decode(content)
+            except codec.ConfigError as e:
+                for error in e.errors:
+                    logging.warning(f"Invalid config, {error}")
+                try:
+                    # Settings that were renamed or removed are dropped, the rest kept
+                    cfg = codec.decode(content, strict=False)
+                except codec.ConfigError:
+                    # Left as is on disk, so that it can be fixed
+                    logging.warning(
+                        "Using the default config until the config is fixed"
+                    )
+                    return AppConfig()
+            # Parsed configs are not the app wide one until made so
+            Singleton._instances[cls] = cfg
+        # Writes out any settings missing from the file, and nothing otherwise
+        cfg.save()
+        return cfg
+
+    def reload(self) -> Set[str]:
+        """
+        Reads the config from disk again and replaces the sections that changed, which
+        are returned. Nothing is replaced if any of it is invalid.
+        """
+        content = store.read()
+        if content is None:
+            return set()
+        config = codec.decode(content)
+        changed = {
+            field.name
+            for field in fields(self)
+            if getattr(self, field.name) != getattr(config, field.name)
+        }
+        for name in changed:
+            setattr(self, name, getattr(config, name))
+        return changed
 
     def save(self):
-        paths = Paths()
-        if platform.system() == "Windows":
-            import win32con
-            import win32file
-
-            win32file.SetFileAttributesW(str(paths.config), win32con.FILE_ATTRIBUTE_NORMAL)
-        with open(paths.config, "w") as f:
-            json.dump(self.__dict__, f, indent=4, default=lambda o: o.__dict__)
-        # Hide the file
-        if platform.system() == "Windows":
-            import win32con
-            import win32file
-
-            win32file.SetFileAttributesW(str(paths.config), win32con.FILE_ATTRIBUTE_HIDDEN)
+        store.save(codec.encode(self))
+
+
+store = ConfigStore(Paths.config)
@@ -0,0 +1,97 @@
+import dataclasses
+import json
+import threading
+from typing import TYPE_CHECKING, Any, List, Optional
+
+if TYPE_CHECKING:
+    from pydantic import TypeAdapter
+    from .app import AppConfig
+
+# pydantic is slow to import, so it is only imported once a config is parsed
+_adapter: Optional["TypeAdapter"] = None
+_lock = threading.Lock()
+
+
+class ConfigError(ValueError):
+    """
+    Everything wrong with a config, rather than only the first problem found.
+    """
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def adapter() -> "TypeAdapter":
+    """
+    Returns the schema of the config, compiled the first time it is needed.
+    """
+    global _adapter
+    with _lock:
+        if _adapter is None:
+            from pydantic import TypeAdapter
+            from .app import AppConfig
+
+            _forbid_extra(AppConfig)
+            _adapter = TypeAdapter(AppConfig)
+        return _adapter
+
+
+def _forbid_extra(section: type):
+    # Unknown settings are most likely typos, so they are reported instead of dropped
+    section.__pydantic_config__ = {"extra": "forbid"}  # type: ignore
+    for field in dataclasses.fields(section):
+        if dataclasses.is_dataclass(field.type):
+            _forbid_extra(field.type)  # type: ignore
+
+
+def _describe(error) -> str:
+    location = ".".join(str(part) for part in error["loc"]) or "config"
+    # Checks of the sections raise ValueError, which pydantic prefixes
+    if error["type"] == "value_error":
+        return f"{location}: {error['ctx']['error']}"
+    if error["type"] in ("extra_forbidden", "unexpected_keyword_argument"):
+        return f"{location}: unknown setting"
+    return f"{location}: {error['msg']}"
+
+
+def _prune(data: Any, section: type) -> Any:
+    # Drops the settings the section does not have, in it and in its subsections
+    if not isinstance(data, dict):
+        return data
+    known = {field.name: field.type for field in dataclasses.fields(section)}
+    return {
+        key: (
+            _prune(value, known[key]) if dataclasses.is_dataclass(known[key]) else value
+        )
+        for key, value in data.items()
+        if key in known
+    }
+
+
+def decode(content: str, strict: bool = True) -> "AppConfig":
+    """
+    Parses and validates a config in one pass, including the checks of each section.
+    Unknown settings are an error, unless not `strict`, in which case they are dropped.
+    The config returned is a new instance, not the app wide one.
+    """
+    from pydantic import ValidationError
+    from .app import AppConfig
+
+    try:
+        if strict:
+            return adapter().validate_json(content)
+        return adapter().validate_python(_prune(json.loads(content), AppConfig))
+    except ValidationError as e:
+        raise ConfigError([_describe(error) for error in e.errors()]) from None
+    except ValueError as e:
+        # Malformed JSON, which validate_json reports as a ValidationError already
+        raise ConfigError([f"config: {e}"]) from None
+
+
+def encode(config: "AppConfig") -> Any:
+    """
+    Returns the config as JSON compatible data, which `decode` turns back into an
+    equal config.
+    """
+    return adapter().dump_python(config, mode="json")
@@ -0,0 +1,93 @@
+import atexit
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import tempfile
+import threading
+from typing import Any, Optional
+from core.scheduler import Handle, Scheduler
+
+
+class ConfigStore:
+    """
+    The config file on disk. Saves are coalesced for `delay` seconds and only written
+    when the content differs from what is on disk, in which case the file is replaced
+    atomically so that a crash never leaves it half written.
+    """
+
+    def __init__(self, path: Path, delay: float = 0.5):
+        self.path = path
+        self.delay = delay
+        self.logger = logging.getLogger(__name__)
+        self.writes = 0
+        self._saved: Any = None
+        self._pending: Any = None
+        self._handle: Optional[Handle] = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def read(self) -> Optional[str]:
+        """
+        Returns the content of the file, or None if there is none yet.
+        """
+        try:
+            with self.path.open("r") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            saved = json.loads(content)
+        except ValueError:
+            saved = None
+        with self._lock:
+            self._saved = saved
+        return content
+
+    def save(self, data: Any):
+        """
+        Saves `data` once no other save came in for `delay` seconds.
+        """
+        with self._lock:
+            self._pending = data
+            # Every save starts the wait over, so a burst of saves is written once
+            if self._handle is not None and self._handle.is_alive():
+                self._handle.cancel()
+            self._handle = Scheduler().schedule(self.delay, self.flush)
+
+    def flush(self):
+        with self._lock:
+            data, self._pending = self._pending, None
+            if self._handle is not None and self._handle.is_alive():
+                self._handle.cancel()
+            self._handle = None
+            # Compare the data rather than the text, reformatting is not a change
+            if data is None or data == self._saved:
+                return
+            self._write(data)
+            self._saved = data
+            self.writes += 1
+
+    def _write(self, data: Any):
+        if platform.system() == "Windows" and self.path.exists():
+            import win32con
+            import win32file
+
+            win32file.SetFileAttributesW(str(self.path), win32con.FILE_ATTRIBUTE_NORMAL)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=4)
+            os.replace(temp, self.path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+        # Hide the file
+        if platform.system() == "Windows":
+            import win32con
+            import win32file
+
+            win32file.SetFileAttributesW(str(self.path), win32con.FILE_ATTRIBUTE_HIDDEN)
+        self.logger.debug(f"Saved {self.path}")
@@ -0,0 +1,98 @@
+import logging
+import queue
+import time
+import tkinter
+from typing import Any, Callable
+
+
+class Dispatcher:
+    """
+    Runs UI work posted from any thread on the Tk main thread, as Tk is not thread
+    safe. The queue is drained in batches by a single recurring `after` callback, each
+    drain stopping once its time budget is spent so the main loop stays responsive.
+    The wait between drains backs off while the queue stays empty.
+    """
+
+    def __init__(
+        self,
+        root: tkinter.Tk,
+        interval: int = 10,
+        budget: float = 0.008,
+        idle: int = 250,
+    ):
+        self.root = root
+        self.interval = interval  # Milliseconds between drains while calls come in
+        self.budget = budget  # Seconds a single drain may take
+        self.idle = idle  # Milliseconds the wait backs off to while none do
+        self._wait = interval
+        self.logger = logging.getLogger(__name__)
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.drained = 0
+        self.latency = 0.0
+        self.latency_max = 0.0
+        self.stopped = False
+
+    def post(self, callback: Callable[..., Any], *args):
+        """
+        Calls `callback` with `args` on the main thread, safe to call from any thread.
+        """
+        self._queue.put((time.perf_counter(), callback, args))
+
+    def start(self):
+        """
+        Starts draining the queue, has to be called from the main thread.
+        """
+        self.root.after(self.interval, self._drain)
+
+    def destroy(self):
+        """
+        Destroys the root once everything posted before has run, and stops draining.
+        Safe to call from any thread, calls posted afterwards are dropped.
+        """
+        self.post(self._destroy)
+
+    def _destroy(self):
+        self.stopped = True
+        self.root.destroy()
+
+    def _drain(self):
+        start = time.perf_counter()
+        drained = self.drained
+        while not self.stopped and time.perf_counter() - start < self.budget:
+            try:
+                posted, callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            latency = time.perf_counter() - posted
+            self.drained += 1
+            self.latency += latency
+            self.latency_max = max(self.latency_max, latency)
+            try:
+                callback(*args)
+            except Exception:
+                self.logger.exception(f"Dispatched call {callback} failed")
+        # The root is gone, so there is nothing left to schedule the next drain on
+        if self.stopped:
+            if not self._queue.empty():
+                self.logger.debug(
+                    f"Dropped {self._queue.qsize()} calls posted after stop"
+                )
+            return
+        # Come straight back if the budget ran out with work left, after letting Tk
+        # handle its own events. While nothing comes in, wait twice as long each time,
+        # so that a hibernating app does not wake up a hundred times a second
+        if not self._queue.empty():
+            self._wait = 1
+        elif self.drained > drained:
+            self._wait = self.interval
+        else:
+            self._wait = min(max(self._wait, self.interval) * 2, self.idle)
+        self.root.after(self._wait, self._drain)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "drained": self.drained,
+            "latency_mean": self.latency / self.drained if self.drained else 0.0,
+            "latency_max": self.latency_max,
+        }
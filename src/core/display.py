@@ -0,0 +1,212 @@
+import logging
+import platform
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, List, Tuple
+
+from core import Singleton
+
+if TYPE_CHECKING:
+    import screeninfo
+
+_lock = threading.Lock()
+_locked = False
+_checked = 0.0
+
+
+def session_locked() -> bool:
+    """
+    Returns whether the desktop is locked, nothing drawn is visible while it is.
+
+    The answer is cached for a second, as this is asked on every animation tick.
+    """
+    global _locked, _checked
+    with _lock:
+        if time.monotonic() - _checked < 1:
+            return _locked
+        _checked = time.monotonic()
+        if platform.system() == "Windows":
+            import ctypes
+
+            # Switching to the input desktop fails while the lock screen is shown
+            desktop = ctypes.windll.user32.OpenInputDesktop(0, False, 0x0100)
+            if not desktop:
+                _locked = True
+            else:
+                _locked = not ctypes.windll.user32.SwitchDesktop(desktop)
+                ctypes.windll.user32.CloseDesktop(desktop)
+        return _locked
+
+
+class Monitors(metaclass=Singleton):
+    """
+    The monitor layout, enumerated once and shared by everything placing windows.
+
+    Enumerating the monitors can be slow, so the layout is only enumerated again once
+    the displays changed or `ttl` seconds have passed. Only Windows tells us about a
+    change, through `watch`, elsewhere the layout is refreshed by the ttl alone.
+    """
+
+    def __init__(self, fallback: Tuple[int, int] = (1920, 1080), ttl: float = 30):
+        self.logger = logging.getLogger(__name__)
+        self.fallback = fallback
+        self.ttl = ttl
+        self._monitors: List["screeninfo.Monitor"] = []
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.enumerations = 0
+        self.changes = 0
+
+    def watch(self):
+        """
+        Enumerates the monitors again whenever the displays change, on Windows.
+        """
+        if platform.system() != "Windows":
+            return
+        threading.Thread(
+            target=_display_changes, args=(self._changed,), name="display", daemon=True
+        ).start()
+
+    def _changed(self):
+        self.changes += 1
+        self.logger.debug("Displays changed")
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Enumerates the monitors again the next time they are asked for.
+        """
+        with self._lock:
+            self._checked = 0.0
+
+    def get(self) -> List["screeninfo.Monitor"]:
+        """
+        Returns a snapshot of the monitors, never empty.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not self._monitors or now - self._checked >= self.ttl:
+                self._checked = now
+                self._monitors = self._enumerate()
+            return self._monitors
+
+    def _enumerate(self) -> List["screeninfo.Monitor"]:
+        # Only imported once needed, as it is slow to import on some platforms
+        import screeninfo
+
+        self.enumerations += 1
+        try:
+            monitors = screeninfo.get_monitors()
+        except screeninfo.ScreenInfoError as e:
+            self.logger.warning(f"Failed to enumerate monitors: {e}")
+            monitors = []
+        if not monitors:
+            width, height = self.fallback
+            monitors = [screeninfo.Monitor(0, 0, width, height, is_primary=True)]
+        return monitors
+
+    @property
+    def primary(self) -> "screeninfo.Monitor":
+        monitors = self.get()
+        return next((m for m in monitors if m.is_primary), monitors[0])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "monitors": len(self._monitors),
+                "enumerations": self.enumerations,
+                "changes": self.changes,
+            }
+
+
+def _display_changes(callback: Callable[[], Any]):
+    # A hidden top level window, as message only windows do not get the broadcast of
+    # WM_DISPLAYCHANGE, pumped on its own thread for as long as the app runs
+    import ctypes
+    from ctypes import wintypes
+
+    WM_DISPLAYCHANGE = 0x007E
+    LRESULT = ctypes.c_ssize_t
+    WNDPROC = ctypes.WINFUNCTYPE(
+        LRESULT, wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM
+    )
+
+    class WNDCLASSW(ctypes.Structure):
+        _fields_ = [
+            ("style", wintypes.UINT),
+            ("lpfnWndProc", WNDPROC),
+            ("cbClsExtra", ctypes.c_int),
+            ("cbWndExtra", ctypes.c_int),
+            ("hInstance", wintypes.HINSTANCE),
+            ("hIcon", wintypes.HICON),
+            ("hCursor", wintypes.HANDLE),
+            ("hbrBackground", wintypes.HBRUSH),
+            ("lpszMenuName", wintypes.LPCWSTR),
+            ("lpszClassName", wintypes.LPCWSTR),
+        ]
+
+    user32 = ctypes.windll.user32
+    kernel32 = ctypes.windll.kernel32
+    user32.DefWindowProcW.argtypes = [
+        wintypes.HWND,
+        wintypes.UINT,
+        wintypes.WPARAM,
+        wintypes.LPARAM,
+    ]
+    user32.DefWindowProcW.restype = LRESULT
+    user32.CreateWindowExW.argtypes = [
+        wintypes.DWORD,
+        wintypes.LPCWSTR,
+        wintypes.LPCWSTR,
+        wintypes.DWORD,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        wintypes.HWND,
+        wintypes.HMENU,
+        wintypes.HINSTANCE,
+        wintypes.LPVOID,
+    ]
+    user32.CreateWindowExW.restype = wintypes.HWND
+    kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+
+    def procedure(hwnd, message, wparam, lparam):
+        if message == WM_DISPLAYCHANGE:
+            try:
+                callback()
+            except Exception:
+                logging.getLogger(__name__).exception("Display change handler failed")
+        return user32.DefWindowProcW(hwnd, message, wparam, lparam)
+
+    # Kept referenced for as long as the window lives
+    window_procedure = WNDPROC(procedure)
+    window_class = WNDCLASSW()
+    window_class.lpfnWndProc = window_procedure
+    window_class.hInstance = kernel32.GetModuleHandleW(None)
+    window_class.lpszClassName = "FrozenAutomataDisplayChanges"
+    hwnd = None
+    if user32.RegisterClassW(ctypes.byref(window_class)):
+        hwnd = user32.CreateWindowExW(
+            0,
+            window_class.lpszClassName,
+            None,
+            0,
+            0,
+            0,
+            0,
+            0,
+            None,
+            None,
+            window_class.hInstance,
+            None,
+        )
+    if not hwnd:
+        logging.getLogger(__name__).warning(
+            "Cannot listen for display changes, relying on the ttl"
+        )
+        return
+    message = wintypes.MSG()
+    while user32.GetMessageW(ctypes.byref(message), None, 0, 0) > 0:
+        user32.TranslateMessage(ctypes.byref(message))
+        user32.DispatchMessageW(ctypes.byref(message))
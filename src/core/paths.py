@@ -12,6 +12,7 @@ _dirs = PlatformDirs(
 class Paths:
     packs: Path = Path(_dirs.user_data_dir).joinpath("packs")
     config: Path = Path(_dirs.user_config_dir).joinpath("config.json")
+    cache: Path = Path(_dirs.user_cache_dir).joinpath("thumbnails")
     resources: Path = (
         Path(sys._MEIPASS).joinpath("resources")  # type: ignore
         if hasattr(sys, "_MEIPASS")
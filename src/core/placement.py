@@ -0,0 +1,165 @@
+import itertools
+import random
+import threading
+from collections import defaultdict
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    import screeninfo
+
+
+class Rect(NamedTuple):
+    x: int
+    y: int
+    width: int
+    height: int
+
+    def overlap(self, other: "Rect") -> int:
+        """
+        Returns the area covered by both rectangles.
+        """
+        width = min(self.x + self.width, other.x + other.width) - max(self.x, other.x)
+        height = min(self.y + self.height, other.y + other.height) - max(
+            self.y, other.y
+        )
+        return max(width, 0) * max(height, 0)
+
+
+class Placement:
+    """
+    Keeps track of the space taken by live popups in a grid, so that new popups can be
+    put where they cover as little of the others as possible.
+
+    Each rectangle is filed under every cell of the grid it touches, so finding what a
+    candidate spot overlaps only looks at the popups around it rather than all of them.
+    """
+
+    def __init__(self, cell: int = 128, samples: int = 24):
+        self.cell = cell
+        self.samples = max(samples, 1)
+        self._grid: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+        self._rects: Dict[int, Rect] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.placed = 0
+        self.overlapping = 0
+
+    def _cells(self, rect: Rect) -> Iterator[Tuple[int, int]]:
+        for column in range(
+            rect.x // self.cell, (rect.x + rect.width - 1) // self.cell + 1
+        ):
+            for row in range(
+                rect.y // self.cell, (rect.y + rect.height - 1) // self.cell + 1
+            ):
+                yield column, row
+
+    def _overlap(self, rect: Rect, limit: float) -> float:
+        nearby = set()
+        for cell in self._cells(rect):
+            nearby.update(self._grid.get(cell, ()))
+        overlap = 0
+        for key in nearby:
+            overlap += rect.overlap(self._rects[key])
+            if overlap >= limit:
+                # Already worse than a spot we have, no need to know by how much
+                return limit
+        return overlap
+
+    def place(
+        self, monitors: Sequence["screeninfo.Monitor"], width: int, height: int
+    ) -> Tuple[int, Rect]:
+        """
+        Reserves a spot for a popup of the given size, fully visible on one of the
+        monitors. Returns a token to release the spot with and the spot itself.
+
+        Random spots are tried first. If none of them is free, every free spot is found
+        and a random one of them taken, and only if there is none at all the tried spot
+        overlapping the other popups the least.
+        """
+        with self._lock:
+            best = None
+            for _ in range(self.samples):
+                monitor = random.choice(monitors)
+                rect = Rect(
+                    random.randint(
+                        monitor.x, monitor.x + max(monitor.width - width, 0)
+                    ),
+                    random.randint(
+                        monitor.y, monitor.y + max(monitor.height - height, 0)
+                    ),
+                    width,
+                    height,
+                )
+                overlap = self._overlap(rect, best[0] if best else float("inf"))
+                if best is None or overlap < best[0]:
+                    best = (overlap, rect)
+                if overlap == 0:
+                    break
+            overlap, rect = best
+            if overlap > 0:
+                # The samples missed, make sure there really is no free spot left
+                free = [
+                    spot
+                    for monitor in monitors
+                    for spot in self._free(monitor, width, height)
+                ]
+                if free:
+                    overlap, rect = 0, random.choice(free)
+            key = next(self._ids)
+            self._rects[key] = rect
+            for cell in self._cells(rect):
+                self._grid[cell].add(key)
+            self.placed += 1
+            self.overlapping += overlap > 0
+            return key, rect
+
+    def _free(
+        self, monitor: "screeninfo.Monitor", width: int, height: int
+    ) -> List[Rect]:
+        # A free spot can be slid left and then up until it touches the edge of the
+        # monitor or of another popup and stay free, so if there is any free spot, one
+        # of those positions is free as well and only they have to be checked
+        right = monitor.x + max(monitor.width - width, 0)
+        bottom = monitor.y + max(monitor.height - height, 0)
+        columns = {monitor.x} | {r.x + r.width for r in self._rects.values()}
+        rows = {monitor.y} | {r.y + r.height for r in self._rects.values()}
+        free = []
+        for x in columns:
+            if not monitor.x <= x <= right:
+                continue
+            for y in rows:
+                if not monitor.y <= y <= bottom:
+                    continue
+                spot = Rect(x, y, width, height)
+                if self._overlap(spot, 1) == 0:
+                    free.append(spot)
+        return free
+
+    def release(self, key: int):
+        with self._lock:
+            rect = self._rects.pop(key, None)
+            if rect is None:
+                return
+            for cell in self._cells(rect):
+                ids = self._grid[cell]
+                ids.discard(key)
+                if not ids:
+                    del self._grid[cell]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "live": len(self._rects),
+                "cells": len(self._grid),
+                "placed": self.placed,
+                "overlapping": self.overlapping,
+            }
@@ -0,0 +1,114 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Callable, List
+from core import Singleton
+
+
+class Handle:
+    """
+    A call scheduled on the `Scheduler`, mirroring the parts of `threading.Timer` the
+    app relies on.
+    """
+
+    __slots__ = ("when", "order", "callback", "args", "cancelled", "fired")
+
+    def __init__(self, when: float, order: int, callback: Callable, args: tuple):
+        self.when = when
+        self.order = order
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self.fired = False
+
+    def __lt__(self, other: "Handle") -> bool:
+        return (self.when, self.order) < (other.when, other.order)
+
+    def cancel(self):
+        Scheduler().cancel(self)
+
+    def is_alive(self) -> bool:
+        return not (self.cancelled or self.fired)
+
+
+class Scheduler(metaclass=Singleton):
+    """
+    Runs every delayed call of the app, launches, activity timeouts and the app timer,
+    from a heap on a single thread, so the number of threads stays the same under load.
+
+    Callbacks run on the scheduler thread and must not block, anything slow belongs on
+    the pipeline. How late callbacks run is tracked as the launch jitter.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._heap: List[Handle] = []
+        self._cancelled = 0
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self.fired = 0
+        self.jitter = 0.0
+        self.jitter_max = 0.0
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def schedule(self, delay: float, callback: Callable[..., Any], *args) -> Handle:
+        """
+        Calls `callback` with `args` after `delay` seconds.
+        """
+        handle = Handle(time.monotonic() + delay, next(self._order), callback, args)
+        with self._condition:
+            heapq.heappush(self._heap, handle)
+            # Only wake the thread if this is now the first call due
+            if self._heap[0] is handle:
+                self._condition.notify()
+        return handle
+
+    def cancel(self, handle: Handle):
+        with self._condition:
+            if not handle.is_alive():
+                return
+            # Cancelled calls are skipped when due, and swept out once they make up
+            # half of the heap so it does not grow unbounded
+            handle.cancelled = True
+            self._cancelled += 1
+            if self._cancelled > len(self._heap) // 2:
+                self._heap = [h for h in self._heap if not h.cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    delay = self._heap[0].when - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                handle = heapq.heappop(self._heap)
+                if handle.cancelled:
+                    self._cancelled -= 1
+                    continue
+                handle.fired = True
+                late = time.monotonic() - handle.when
+                self.fired += 1
+                self.jitter += late
+                self.jitter_max = max(self.jitter_max, late)
+            try:
+                handle.callback(*handle.args)
+            except Exception:
+                self.logger.exception(f"Scheduled call {handle.callback} failed")
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "pending": len(self._heap) - self._cancelled,
+                "fired": self.fired,
+                "jitter_mean": self.jitter / self.fired if self.fired else 0.0,
+                "jitter_max": self.jitter_max,
+            }
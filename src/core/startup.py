@@ -0,0 +1,109 @@
+import importlib.abc
+import logging
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# As close to the start of the process as can be measured from within it
+STARTED = time.perf_counter()
+
+logger = logging.getLogger(__name__)
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader, profiler: "ImportProfiler"):
+        self.loader = loader
+        self.profiler = profiler
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.profiler.enter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profiler.exit(module.__name__)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    """
+    Times every module imported after it is installed, like `python -X importtime`
+    but from within the app, so that it also works in the frozen executable.
+    """
+
+    def __init__(self):
+        self.imports: List[Tuple[str, float, float]] = []  # Name, self, cumulative
+        self._local = threading.local()
+
+    @property
+    def _stack(self) -> List[List[float]]:
+        # Imports on other threads nest independently, so each keeps its own stack
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def find_spec(self, name, path, target=None):
+        # Find the module as if we were not here, and time its loader
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    def enter(self):
+        # Start time, and the time spent importing nested modules
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def exit(self, name: str):
+        started, nested = self._stack.pop()
+        cumulative = time.perf_counter() - started
+        self.imports.append((name, cumulative - nested, cumulative))
+        if self._stack:
+            self._stack[-1][1] += cumulative
+
+    def report(self, top: int = 25) -> str:
+        lines = [f"{'self [us]':>10} | {'cumulative':>10} | imported package"]
+        for name, own, cumulative in sorted(
+            self.imports, key=lambda i: i[2], reverse=True
+        )[:top]:
+            lines.append(f"{own * 1e6:>10.0f} | {cumulative * 1e6:>10.0f} | {name}")
+        return "\n".join(lines)
+
+
+profiler: Optional[ImportProfiler] = None
+_marks: Dict[str, float] = {}
+
+
+def profile_imports():
+    """
+    Starts timing imports, which has to happen before the imports to time.
+    """
+    global profiler
+    if profiler is None:
+        profiler = ImportProfiler()
+        sys.meta_path.insert(0, profiler)
+
+
+def mark(name: str) -> float:
+    """
+    Records how long after start up `name` happened, in seconds.
+    """
+    elapsed = _marks[name] = time.perf_counter() - STARTED
+    logger.info(f"{name} after {elapsed * 1000:.0f}ms")
+    if profiler is not None:
+        logger.info(f"Slowest imports until {name}:\n{profiler.report()}")
+    return elapsed
+
+
+def marks() -> Dict[str, float]:
+    return dict(_marks)
@@ -1 +1,4 @@
+from .archive import Archive, Member, open_image
+from .index import Asset, PackIndex
 from .pack import Pack
+from .watch import Watcher
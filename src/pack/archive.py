@@ -0,0 +1,261 @@
+import io
+import json
+import logging
+import mmap
+import os
+from pathlib import Path, PurePosixPath
+import struct
+import tempfile
+import threading
+from typing import BinaryIO, Dict, NamedTuple, Set, Tuple, Union
+from PIL import Image
+from .index import PackIndex
+
+MAGIC = b"FAPACK01"
+SUFFIX = ".fapack"
+# Members start on 8 byte boundaries
+ALIGNMENT = 8
+
+_archives: Dict[str, "Archive"] = {}
+_archives_lock = threading.Lock()
+
+
+class MemberStat(NamedTuple):
+    st_size: int
+    st_mtime_ns: int
+
+    @property
+    def st_mtime(self) -> float:
+        return self.st_mtime_ns / 1e9
+
+
+class MemberReader(io.RawIOBase):
+    """
+    A read only file over the bytes of a member. Reads copy only the bytes asked for
+    out of the mapping, the member is never read into memory as a whole.
+    """
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = max(min(len(buffer), len(self._view) - self._position), 0)
+        buffer[:count] = self._view[self._position : self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(offset, 0)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+class Member:
+    """
+    An asset inside an archive, which stands in for the path of a loose asset: it can
+    be stat'ed and opened, and is pickled by reference to its archive.
+    """
+
+    def __init__(
+        self, archive: "Archive", name: str, offset: int, size: int, mtime: int
+    ):
+        self.archive = archive
+        self.key = name
+        self.offset = offset
+        self.size = size
+        self.mtime = mtime
+        self.name = PurePosixPath(name).name
+        self.suffix = PurePosixPath(name).suffix
+
+    def stat(self) -> MemberStat:
+        return MemberStat(self.size, self.mtime)
+
+    def buffer(self) -> memoryview:
+        return self.archive.view[self.offset : self.offset + self.size]
+
+    def open(self, mode: str = "rb") -> BinaryIO:
+        if mode != "rb":
+            raise ValueError(f"Archive members can only be opened as rb, not {mode}")
+        return MemberReader(self.buffer())  # type: ignore
+
+    def extract(self, directory: Path) -> Path:
+        """
+        Returns a file with the contents of the member, for what needs a real file.
+        """
+        file = directory.joinpath(f"{self.mtime}-{self.size}-{self.name}")
+        if not file.exists():
+            directory.mkdir(parents=True, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.buffer())
+            os.replace(temp, file)
+        return file
+
+    def __reduce__(self):
+        return (_member, (str(self.archive.path), self.key))
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, Member)
+            and other.archive is self.archive
+            and other.key == self.key
+        )
+
+    def __hash__(self) -> int:
+        return hash((str(self.archive.path), self.key))
+
+    def __str__(self) -> str:
+        return f"{self.archive.path}/{self.key}"
+
+    def __repr__(self) -> str:
+        return f"Member({str(self)!r})"
+
+
+def _member(path: str, name: str) -> Member:
+    return Archive.open(Path(path)).member(name)
+
+
+class Archive:
+    """
+    A pack in a single uncompressed file, which is memory mapped so that assets are
+    read from the mapping instead of opening a file for each of them.
+
+    The file starts with `MAGIC` and the length of a JSON header holding pack.json, the
+    index of the assets, and where each member is in the file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self._mmap)
+        if self.view[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a pack archive")
+        (length,) = struct.unpack_from("<Q", self.view, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(bytes(self.view[start : start + length]))
+        self.config: dict = header["config"]
+        self.assets: Dict[str, dict] = header["assets"]
+        self._members = {
+            name: Member(self, name, *entry)
+            for name, entry in header["members"].items()
+        }
+
+    @staticmethod
+    def open(path: Path) -> "Archive":
+        """
+        Returns the archive at `path`, mapping it only once per process.
+        """
+        with _archives_lock:
+            archive = _archives.get(str(path))
+            if archive is None:
+                archive = _archives[str(path)] = Archive(path)
+            return archive
+
+    def member(self, name: str) -> Member:
+        return self._members[name]
+
+    @staticmethod
+    def write(directory: Path, output: Path) -> Path:
+        """
+        Packs the pack at `directory` into a single archive at `output`.
+        """
+        with directory.joinpath("pack.json").open("r") as f:
+            config = json.load(f)
+        index = PackIndex(
+            directory,
+            {
+                "image": directory.joinpath("images"),
+                "gif": directory.joinpath("gifs"),
+                "wallpaper": directory.joinpath("wallpapers"),
+            },
+            None,
+        )
+        # Only kept in memory, packing a directory does not write to it
+        index.update()
+
+        files = sorted(
+            file
+            for file in directory.rglob("*")
+            if file.is_file() and file.name not in ("pack.json", PackIndex.NAME)
+        )
+        members: Dict[str, Tuple[int, int, int]] = {}
+        offset = 0
+        for file in files:
+            stat = file.stat()
+            members[file.relative_to(directory).as_posix()] = (
+                offset,
+                stat.st_size,
+                stat.st_mtime_ns,
+            )
+            offset += -(-stat.st_size // ALIGNMENT) * ALIGNMENT
+        # Offsets are relative to the end of the header until its length is known
+        header = {"config": config, "assets": index.entries, "members": members}
+        length = len(json.dumps(header).encode())
+        while True:
+            start = -(-(len(MAGIC) + 8 + length) // ALIGNMENT) * ALIGNMENT
+            header["members"] = {
+                name: (start + entry[0], entry[1], entry[2])
+                for name, entry in members.items()
+            }
+            encoded = json.dumps(header).encode()
+            if len(encoded) <= start - len(MAGIC) - 8:
+                break
+            length = len(encoded)
+
+        fd, temp = tempfile.mkstemp(dir=output.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", start - len(MAGIC) - 8))
+            f.write(encoded.ljust(start - len(MAGIC) - 8, b" "))
+            for file in files:
+                with file.open("rb") as source:
+                    data = source.read()
+                f.write(data.ljust(-(-len(data) // ALIGNMENT) * ALIGNMENT, b"\0"))
+        os.replace(temp, output)
+        return output
+
+
+class ArchiveIndex(PackIndex):
+    """
+    The index of an archive, built when the archive was written and never changing.
+    """
+
+    def __init__(self, archive: Archive):
+        self.logger = logging.getLogger(__name__)
+        self.path = archive.path
+        self.kinds = {}
+        self.archive = archive
+        self._entries = archive.assets
+        self._build()
+
+    def _locate(self, key: str) -> Union[Path, Member]:
+        return self.archive.member(key)
+
+    def update(self, workers=None) -> Set[Path]:
+        return set()
+
+    def save(self):
+        pass
+
+
+def open_image(path: Union[Path, Member]) -> Image.Image:
+    """
+    Opens the image at `path`, which is either a file or a member of an archive.
+    """
+    if isinstance(path, Member):
+        return Image.open(path.open())
+    return Image.open(path)
@@ -0,0 +1,194 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from PIL import Image, ImageSequence
+
+# Browsers treat frames without a duration as 100ms, so do we
+DEFAULT_DURATION = 100
+
+
+class Asset(NamedTuple):
+    path: Path
+    kind: str
+    width: int
+    height: int
+    frames: int
+    durations: Tuple[int, ...]  # Milliseconds, one per frame of an animation
+    hash: str
+
+
+def probe(path: Path) -> dict:
+    """
+    Returns what the index records about the asset at `path`, or the reason it cannot
+    be shown if it is not a readable image.
+    """
+    try:
+        digest = hashlib.blake2b(digest_size=16)
+        with path.open("rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        with Image.open(path) as image:
+            width, height = image.size
+            frames = getattr(image, "n_frames", 1)
+            if frames > 1:
+                # Seeking decodes every frame, which also tells us they are all intact
+                durations = [
+                    frame.info.get("duration") or DEFAULT_DURATION
+                    for frame in ImageSequence.Iterator(image)
+                ]
+            else:
+                durations = []
+                image.verify()
+    except Exception as e:
+        return {"error": str(e) or type(e).__name__}
+    return {
+        "width": width,
+        "height": height,
+        "frames": frames,
+        "durations": durations,
+        "hash": digest.hexdigest(),
+    }
+
+
+class PackIndex:
+    """
+    A manifest of the assets of a pack, so that loading the pack does not have to open
+    every file to know which ones can be shown and how large they are.
+
+    Entries are validated by the size and mtime of the file, only new and changed files
+    are probed again, in parallel. The manifest is kept in `cache`, or only in memory
+    without one. A manifest shipped with the pack is read as a starting point, but the
+    pack itself is never written to.
+    """
+
+    NAME = "pack.index"
+    VERSION = 1
+
+    def __init__(self, path: Path, kinds: Dict[str, Path], cache: Optional[Path]):
+        self.path = path
+        self.kinds = kinds
+        self.cache = cache
+        self.logger = logging.getLogger(__name__)
+        self._entries: Dict[str, dict] = {}
+        self._assets: Dict[str, List[Asset]] = {}
+        self._by_path: Dict[Path, Asset] = {}
+        self._lock = threading.Lock()
+        # A manifest in the cache is newer than one shipped with the pack
+        files = [self.path.joinpath(self.NAME)]
+        if cache is not None:
+            files.append(cache.joinpath(self.NAME))
+        for file in files:
+            try:
+                with file.open("r") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if manifest.get("version") == self.VERSION:
+                self._entries.update(manifest["assets"])
+
+    def update(self, workers: Optional[int] = None) -> Set[Path]:
+        """
+        Brings the index up to date with the files of the pack, returning the assets
+        that were added, changed or removed.
+        """
+        with self._lock:
+            return self._update(workers)
+
+    def _update(self, workers: Optional[int]) -> Set[Path]:
+        entries: Dict[str, dict] = {}
+        stale: Dict[str, Path] = {}
+        for kind, directory in self.kinds.items():
+            if not directory.is_dir():
+                continue
+            for file in directory.iterdir():
+                if not file.is_file():
+                    continue
+                key = file.relative_to(self.path).as_posix()
+                stat = file.stat()
+                entry = self._entries.get(key)
+                if (
+                    entry is not None
+                    and entry["kind"] == kind
+                    and entry["size"] == stat.st_size
+                    and entry["mtime"] == stat.st_mtime_ns
+                ):
+                    entries[key] = entry
+                else:
+                    entries[key] = {
+                        "kind": kind,
+                        "size": stat.st_size,
+                        "mtime": stat.st_mtime_ns,
+                    }
+                    stale[key] = file
+
+        if stale:
+            with ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+                for key, result in zip(stale, pool.map(probe, stale.values())):
+                    entries[key].update(result)
+                    if "error" in result:
+                        self.logger.warning(f"Skipping {key}: {result['error']}")
+        changed = {self._locate(key) for key in stale}
+        changed.update(
+            self._locate(key) for key in self._entries.keys() - entries.keys()
+        )
+        self._entries = entries
+        self._build()
+        if changed:
+            self.save()
+        self.logger.debug(f"Indexed {len(entries)} assets, probed {len(stale)}")
+        return changed
+
+    @property
+    def entries(self) -> Dict[str, dict]:
+        return self._entries
+
+    def _locate(self, key: str) -> Path:
+        return self.path.joinpath(key)
+
+    def _build(self):
+        self._assets = {kind: [] for kind in self.kinds}
+        self._by_path = {}
+        for key, entry in sorted(self._entries.items()):
+            if "error" in entry:
+                continue
+            asset = Asset(
+                self._locate(key),
+                entry["kind"],
+                entry["width"],
+                entry["height"],
+                entry["frames"],
+                tuple(entry["durations"]),
+                entry["hash"],
+            )
+            self._assets.setdefault(asset.kind, []).append(asset)
+            self._by_path[asset.path] = asset
+
+    def save(self):
+        if self.cache is None:
+            return
+        manifest = {"version": self.VERSION, "assets": self._entries}
+        try:
+            self.cache.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so a crash never leaves half a manifest
+            fd, temp = tempfile.mkstemp(dir=self.cache, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(manifest, f)
+                os.replace(temp, self.cache.joinpath(self.NAME))
+            except BaseException:
+                os.unlink(temp)
+                raise
+        except OSError as e:
+            self.logger.warning(f"Failed to save {self.NAME}: {e}")
+
+    def assets(self, kind: str) -> List[Asset]:
+        return self._assets.get(kind, [])
+
+    def get(self, path: Path) -> Optional[Asset]:
+        return self._by_path.get(path)
@@ -1,9 +1,38 @@
 from functools import cache
 import json
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple, Union
 from core import Singleton
 from core.paths import Paths
+from .archive import SUFFIX, Archive, ArchiveIndex, Member
+from .index import Asset, PackIndex
+
+# Where pre-rendered variants of the assets are, see packtool.py
+VARIANTS = "variants"
+
+# What pack.json must hold, and of which type
+REQUIRED = {
+    "description": str,
+    "tags": list,
+    "prompts": list,
+    "buttons": list,
+    "webs": list,
+}
+
+
+def validate(config: dict) -> List[str]:
+    """
+    Returns what is wrong with the pack.json `config`, if anything.
+    """
+    problems = []
+    for key, kind in REQUIRED.items():
+        if key not in config:
+            problems.append(f"{key} is missing")
+        elif not isinstance(config[key], kind):
+            problems.append(f"{key} should be a {kind.__name__}")
+        elif kind is list and not all(isinstance(item, str) for item in config[key]):
+            problems.append(f"{key} should only hold strings")
+    return problems
 
 
 class Pack(metaclass=Singleton):
@@ -11,38 +40,132 @@ class Pack(metaclass=Singleton):
     config: dict
     description: str
     tags: List[str]
+    archive: Optional[Archive] = None
     images: Path
+    gifs: Path
     wallpapers: Path
     prompts: List[str]
     buttons: List[str]
 
     def __init__(self, name: str = "default"):
+        self.name = name
         self.path = Paths.packs.joinpath(name).resolve()
-        if not self.path.exists():
-            self.path = Paths.resources.joinpath("packs", "default").resolve()
-        with self.path.joinpath("pack.json").open("r") as f:
-            self.config = json.load(f)
+        archive = Paths.packs.joinpath(f"{name}{SUFFIX}").resolve()
+        if not self.path.exists() and archive.is_file():
+            # A pack in a single file, its assets are read from the mapped archive
+            self.path = archive
+            self.archive = Archive.open(archive)
+            self.config = self.archive.config
+        else:
+            if not self.path.exists():
+                self.path = Paths.resources.joinpath("packs", "default").resolve()
+            with self.path.joinpath("pack.json").open("r") as f:
+                self.config = json.load(f)
         self.images = self.path.joinpath("images").resolve()
         self.gifs = self.path.joinpath("gifs").resolve()
         self.wallpapers = self.path.joinpath("wallpapers").resolve()
+        problems = validate(self.config)
+        if problems:
+            raise ValueError(f"Invalid pack.json: {', '.join(problems)}")
+        self.description = self.config["description"]
+        self.tags = self.config["tags"]
+        self.prompts = self.config["prompts"]
+        self.buttons = self.config["buttons"]
+        self.webs = self.config["webs"]
+        if self.archive is not None:
+            self.index: PackIndex = ArchiveIndex(self.archive)
+        else:
+            # The manifest is kept apart from the disk cache, which owns the cache
+            # directory of the pack
+            self.index = PackIndex(
+                self.path,
+                {"image": self.images, "gif": self.gifs, "wallpaper": self.wallpapers},
+                Paths.cache.joinpath(name, "index"),
+            )
+            self.index.update()
+
+        # The boxes each asset was pre-rendered for, so that it does not have to be
+        # scaled at runtime
+        self.variants: Dict[str, List[Tuple[int, int]]] = {}
         try:
-            self.description = self.config["description"]
-            self.tags = self.config["tags"]
-            self.prompts = self.config["prompts"]
-            self.buttons = self.config["buttons"]
-            self.webs = self.config["webs"]
-        except KeyError:
-            raise ValueError("Invalid pack.json")
+            if self.archive is not None:
+                variants = json.loads(
+                    bytes(self.archive.member(f"{VARIANTS}/index.json").buffer())
+                )
+            else:
+                with self.path.joinpath(VARIANTS, "index.json").open("r") as f:
+                    variants = json.load(f)
+            self.variants = {
+                key: [tuple(box) for box in boxes] for key, boxes in variants.items()
+            }
+        except (OSError, KeyError, ValueError):
+            pass
+
+    def variant(
+        self, path: Union[Path, Member], box: Tuple[int, int]
+    ) -> Union[Path, Member]:
+        """
+        Returns the smallest pre-rendered variant of an asset that still covers `box`,
+        or the asset itself if there is none. A variant rendered for `box` is shown as
+        is, any other only needs a small downscale.
+        """
+        if not self.variants:
+            return path
+        if isinstance(path, Member):
+            key = path.key
+        else:
+            try:
+                key = path.relative_to(self.path).as_posix()
+            except ValueError:
+                return path
+        boxes = [
+            (width, height)
+            for width, height in self.variants.get(key, ())
+            if width >= box[0] and height >= box[1]
+        ]
+        if not boxes:
+            return path
+        width, height = min(boxes, key=lambda b: b[0] * b[1])
+        name = f"{VARIANTS}/{width}x{height}/{key}"
+        if self.archive is not None:
+            return self.archive.member(name)
+        return self.path.joinpath(name)
+
+    def refresh(self) -> Set[Path]:
+        """
+        Brings the asset lists up to date with the pack directory, probing only new and
+        changed files. Returns the assets that were added, changed or removed.
+        """
+        changed = self.index.update()
+        if changed:
+            for accessor in (Pack.image, Pack.gif, Pack.wallpaper):
+                accessor.fget.cache_clear()  # type: ignore
+        return changed
+
+    def asset(self, path: Union[Path, Member]) -> Optional[Asset]:
+        """
+        Returns what is known about an asset of the pack without opening it.
+        """
+        return self.index.get(path)
+
+    def file(self, path: Union[Path, Member]) -> Path:
+        """
+        Returns a file with the contents of an asset, for what cannot read from an
+        archive, such as the system setting the wallpaper.
+        """
+        if isinstance(path, Member):
+            return path.extract(Paths.cache.joinpath(self.name, "extracted"))
+        return path
 
     @property
     @cache
     def image(self):
-        return list(self.images.glob("*"))
+        return [asset.path for asset in self.index.assets("image")]
 
     @property
     @cache
     def wallpaper(self):
-        return list(self.wallpapers.glob("*"))
+        return [asset.path for asset in self.index.assets("wallpaper")]
 
     @property
     @cache
@@ -57,7 +180,7 @@ class Pack(metaclass=Singleton):
     @property
     @cache
     def gif(self):
-        return list(self.gifs.glob("*"))
+        return [asset.path for asset in self.index.assets("gif")]
 
     @property
     @cache
@@ -0,0 +1,139 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+from pathlib import Path
+import platform
+import select
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# inotify events that change what is in a directory or what a file holds
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+)
+
+
+class Watcher:
+    """
+    Calls `callback` on its own thread once files in `directories` changed, after
+    changes settled for `delay` seconds so that a copy of many files is one change.
+
+    Uses inotify where available, and otherwise polls the size and mtime of the files
+    every `interval` seconds, which only stats them.
+    """
+
+    def __init__(
+        self,
+        directories: List[Path],
+        callback: Callable[[], None],
+        interval: float = 2,
+        delay: float = 0.5,
+    ):
+        self.directories = directories
+        self.callback = callback
+        self.interval = interval
+        self.delay = delay
+        self.logger = logging.getLogger(__name__)
+        self.changes = 0
+        self._stopped = threading.Event()
+        self._fd: Optional[int] = None
+        self._libc = None
+        if platform.system() == "Linux":
+            try:
+                self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+                fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+                if fd >= 0:
+                    self._fd = fd
+            except (OSError, AttributeError) as e:
+                self.logger.debug(f"inotify is not available, polling instead: {e}")
+        self._thread = threading.Thread(
+            target=self._notify if self._fd is not None else self._poll, daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _changed(self):
+        self.changes += 1
+        try:
+            self.callback()
+        except Exception:
+            self.logger.exception("Failed to apply changes")
+
+    def _watch(self):
+        # Watching a directory again is a no-op, so do so for any that appeared since
+        for directory in self.directories:
+            if directory.is_dir():
+                self._libc.inotify_add_watch(  # type: ignore
+                    self._fd, os.fsencode(directory), _IN_MASK
+                )
+
+    def _drain(self) -> bool:
+        changed = False
+        while True:
+            try:
+                changed |= bool(os.read(self._fd, 64 * 1024))  # type: ignore
+            except BlockingIOError:
+                return changed
+
+    def _notify(self):
+        self._watch()
+        try:
+            while not self._stopped.is_set():
+                readable, _, _ = select.select([self._fd], [], [], 1)
+                if not readable or not self._drain():
+                    continue
+                # Wait for the changes to settle before applying them all at once
+                while not self._stopped.wait(self.delay) and self._drain():
+                    pass
+                self._watch()
+                self._changed()
+        finally:
+            os.close(self._fd)  # type: ignore
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for directory in self.directories:
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+        return snapshot
+
+    def _poll(self):
+        previous = self._snapshot()
+        while not self._stopped.wait(self.interval):
+            snapshot = self._snapshot()
+            if snapshot == previous:
+                continue
+            # Wait for the changes to settle before applying them all at once
+            while not self._stopped.wait(self.delay):
+                settled = self._snapshot()
+                if settled == snapshot:
+                    break
+                snapshot = settled
+            previous = snapshot
+            self._changed()
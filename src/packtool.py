@@ -0,0 +1,229 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import sys
+import tempfile
+from typing import List, Optional, Tuple
+from PIL import Image, ImageSequence
+from assets.decode import fit, scale
+from pack.archive import SUFFIX, Archive
+from pack.pack import VARIANTS, validate
+
+# Screens to pre-render for, and the share of the screen popups fit within (App.box)
+SCREENS = [
+    (1280, 720),
+    (1366, 768),
+    (1536, 864),
+    (1920, 1080),
+    (2560, 1440),
+    (3840, 2160),
+]
+SCALES = [0.3, 0.5]
+# Directories of the pack holding assets that are shown scaled
+KINDS = ("images", "gifs")
+# Browsers treat frames without a duration as 100ms, so do we
+DEFAULT_DURATION = 100
+
+logger = logging.getLogger("packtool")
+
+
+def ladder() -> List[Tuple[int, int]]:
+    """
+    Returns the boxes popups fit within on the common screens, as App.box computes them.
+    """
+    return sorted(
+        {
+            (int(width * scale), int(height * scale))
+            for width, height in SCREENS
+            for scale in SCALES
+        }
+    )
+
+
+def _write(file: Path, save):
+    # Write to a temporary file first, so an interrupted build never leaves half a file
+    file.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=file.parent, suffix=file.suffix)
+    os.close(fd)
+    try:
+        save(temp)
+        os.replace(temp, file)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def _render_image(image: Image.Image, box: Tuple[int, int], file: Path):
+    scaled = scale(image, box, "quality")
+    params = {"quality": 90} if image.format == "JPEG" else {}
+    _write(file, lambda temp: scaled.save(temp, format=image.format, **params))
+
+
+def _render_gif(image: Image.Image, box: Tuple[int, int], file: Path, cap: int):
+    frames: List[Image.Image] = []
+    durations: List[int] = []
+    for frame in ImageSequence.Iterator(image):
+        # Palette frames can only be resized as nearest, so resample them in colour
+        frames.append(scale(frame.convert("RGBA"), box, "quality"))
+        durations.append(frame.info.get("duration") or DEFAULT_DURATION)
+
+    def save(temp):
+        frames[0].save(
+            temp,
+            format="GIF",
+            save_all=True,
+            append_images=frames[1:],
+            duration=durations,
+            loop=image.info.get("loop", 0),
+            disposal=2,
+            optimize=True,
+        )
+
+    _write(file, save)
+    # Drop every other frame until the gif is within the cap, keeping its timing
+    while file.stat().st_size > cap and len(frames) > 1:
+        durations = [sum(durations[i : i + 2]) for i in range(0, len(durations), 2)]
+        frames = frames[::2]
+        _write(file, save)
+
+
+def render(
+    task: Tuple[Path, str, Path, List[Tuple[int, int]], int],
+) -> Tuple[str, List[Tuple[int, int]], Optional[str]]:
+    """
+    Renders the variants of one asset, returning the boxes it has variants for and
+    what went wrong, if anything. Runs on the pool.
+    """
+    source, key, output, boxes, cap = task
+    rendered = []
+    try:
+        with Image.open(source) as image:
+            animated = getattr(image, "n_frames", 1) > 1
+            for box in boxes:
+                if fit(image.size, box) == image.size:
+                    # The asset already fits, so it is shown as is
+                    continue
+                file = output.joinpath(f"{box[0]}x{box[1]}", key)
+                # Only render variants that are older than the asset
+                if (
+                    not file.exists()
+                    or file.stat().st_mtime_ns < source.stat().st_mtime_ns
+                ):
+                    if animated:
+                        _render_gif(image, box, file, cap)
+                    else:
+                        _render_image(image, box, file)
+                rendered.append(box)
+    except Exception as e:
+        return key, [], str(e) or type(e).__name__
+    return key, rendered, None
+
+
+def _load(directory: Path) -> Optional[dict]:
+    try:
+        with directory.joinpath("pack.json").open("r") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Cannot read pack.json: {e}")
+        return None
+    problems = validate(config)
+    for problem in problems:
+        logger.error(f"pack.json: {problem}")
+    return None if problems else config
+
+
+def build(args: argparse.Namespace) -> int:
+    directory = Path(args.pack).resolve()
+    if _load(directory) is None:
+        return 1
+    output = directory.joinpath(VARIANTS)
+    boxes = ladder()
+    tasks = [
+        (
+            file,
+            file.relative_to(directory).as_posix(),
+            output,
+            boxes,
+            args.gif_cap * 1024 * 1024,
+        )
+        for kind in KINDS
+        if directory.joinpath(kind).is_dir()
+        for file in sorted(directory.joinpath(kind).iterdir())
+        if file.is_file()
+    ]
+    logger.info(f"Rendering {len(tasks)} assets for {len(boxes)} boxes")
+
+    variants = {}
+    failed = 0
+    with multiprocessing.Pool(args.jobs or None) as pool:
+        for key, rendered, error in pool.imap_unordered(render, tasks):
+            if error is not None:
+                logger.warning(f"Skipping {key}: {error}")
+                failed += 1
+            elif rendered:
+                variants[key] = rendered
+    output.mkdir(parents=True, exist_ok=True)
+    _write(
+        output.joinpath("index.json"),
+        lambda temp: Path(temp).write_text(json.dumps(variants, sort_keys=True)),
+    )
+    logger.info(
+        f"Rendered {sum(len(b) for b in variants.values())} variants of"
+        f" {len(variants)} assets, {failed} failed"
+    )
+    return 0
+
+
+def archive(args: argparse.Namespace) -> int:
+    directory = Path(args.pack).resolve()
+    if _load(directory) is None:
+        return 1
+    output = Path(args.output) if args.output else directory.with_suffix(SUFFIX)
+    Archive.write(directory, output)
+    logger.info(f"Wrote {output}")
+    return 0
+
+
+def check(args: argparse.Namespace) -> int:
+    if _load(Path(args.pack).resolve()) is None:
+        return 1
+    logger.info("pack.json is valid")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tools for pack authors")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser(
+        "build", help="pre-render the assets of a pack for common screen sizes"
+    )
+    command.add_argument("pack", help="directory of the pack")
+    command.add_argument("--jobs", type=int, default=0, help="processes to render with")
+    command.add_argument(
+        "--gif-cap", type=int, default=8, help="largest size of a rendered gif in MB"
+    )
+    command.set_defaults(run=build)
+
+    command = commands.add_parser(
+        "archive", help="pack a pack directory into a single file"
+    )
+    command.add_argument("pack", help="directory of the pack")
+    command.add_argument("output", nargs="?", help=f"defaults to <pack>{SUFFIX}")
+    command.set_defaults(run=archive)
+
+    command = commands.add_parser("check", help="validate the pack.json of a pack")
+    command.add_argument("pack", help="directory of the pack")
+    command.set_defaults(run=check)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())